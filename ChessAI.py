@@ -1,144 +1,965 @@
+import json
+import multiprocessing
 import random
+import struct
+import threading
+import time
+from array import array
+from multiprocessing import shared_memory
+
+from ChessBook import OpeningBook
+from ChessEngine import GameState, KING_ATTACKS, MOVE_SQUARES, popCount
+from ChessEval import (pieceScore, MAX_PHASE, DOUBLED_PAWN_PENALTY, ISOLATED_PAWN_PENALTY, BACKWARD_PAWN_PENALTY,
+                       PASSED_PAWN_BONUS, FILE_MASKS, ADJACENT_FILE_MASKS, PASSED_PAWN_MASKS, PAWN_SUPPORT_MASKS,
+                       STOP_ATTACK_MASKS)
 
-pieceScore = {"K": 0, "Q": 9, "R": 5, "B": 3.3, "N": 3.2, "p": 1}
 CHECKMATE = 100000
 STALEMATE = 0
 DEPTH = 3
+MAX_DEPTH = 32
+# Nodes searched between clock checks when a time limit is set
+TIME_CHECK_INTERVAL = 1024
+# Transposition table size; the slot count is the largest power of two that fits
+TT_SIZE_MB = 16
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+# A capture is skipped in quiescence when even winning the piece plus this margin cannot raise alpha
+DELTA_MARGIN = 2
+# Killer slots kept per ply of the search tree
+MAX_PLY = 64
+# Pawn structure cache slots (a power of two)
+PAWN_TABLE_SIZE = 1 << 14
+# Root-split workers search each move just below the shared alpha, so a move that ties the best one still
+# returns its exact score and ties resolve by root order rather than by which worker finished first
+ROOT_SPLIT_MARGIN = 0.001
+# Width of the null window principal variation search uses to test moves after the first
+NULL_WINDOW = 0.001
+# Root window around the previous iteration's score (in pawns), doubled after each fail high or low,
+# used from ASPIRATION_MIN_DEPTH on
+ASPIRATION_WINDOW = 0.5
+ASPIRATION_MIN_DEPTH = 3
+# Null-move pruning: from NULL_MOVE_MIN_DEPTH on, a side that still fails high after passing, searched
+# NULL_MOVE_REDUCTION plies shallower, is assumed to fail high with a real move too
+NULL_MOVE_PRUNING = True
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+# Late move reductions: from LMR_MIN_DEPTH on, quiet moves after the first LMR_MIN_MOVES are searched LMR_REDUCTION
+# plies shallower, and again at full depth if they beat alpha
+LATE_MOVE_REDUCTIONS = True
+LMR_REDUCTION = 1
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+# JSONL file that every findBestMove call appends its SearchStats to, or None for no log
+SEARCH_LOG_PATH = None
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results in parallel arrays, indexed by the low bits of the Zobrist key.
+    A slot is replaced when it is empty, holds the same position, was written by an earlier search or was
+    searched no deeper than the new result."""
+    ENTRY_BYTES = 8 + 8 + 4 + 1 + 1 + 1
+
+    def __init__(self, sizeMB=TT_SIZE_MB):
+        self.resize(sizeMB)
+
+    def resize(self, sizeMB):
+        slots = 1
+        while slots * 2 * self.ENTRY_BYTES <= sizeMB * 1024 * 1024:
+            slots *= 2
+        self.size = slots
+        self.mask = slots - 1
+        self.clear()
+
+    def clear(self):
+        self.keys = array('Q', [0]) * self.size
+        self.scores = array('d', [0.0]) * self.size
+        self.moves = array('I', [0]) * self.size
+        self.depths = array('b', [-1]) * self.size
+        self.bounds = array('B', [0]) * self.size
+        self.ages = array('B', [0]) * self.size
+        self.age = 0
+        self.probes = self.hits = self.stores = 0
+
+    def newSearch(self):
+        """Start a new age and reset the probe, hit and store counts"""
+        self.age = (self.age + 1) & 0xFF
+        self.probes = self.hits = self.stores = 0
+
+    def probe(self, key):
+        """(depth, bound, score, move code) stored for key, or None"""
+        self.probes += 1
+        i = key & self.mask
+        if self.keys[i] != key or self.depths[i] < 0:
+            return None
+        self.hits += 1
+        return self.depths[i], self.bounds[i], self.scores[i], self.moves[i]
+
+    def store(self, key, depth, bound, score, moveCode):
+        i = key & self.mask
+        if (self.keys[i] == key or self.ages[i] != self.age or depth >= self.depths[i]):
+            self.stores += 1
+            if moveCode == 0 and self.keys[i] == key:
+                moveCode = self.moves[i]
+            self.keys[i] = key
+            self.depths[i] = depth
+            self.bounds[i] = bound
+            self.scores[i] = score
+            self.moves[i] = moveCode
+            self.ages[i] = self.age
+
+    def hashMove(self, key):
+        """From/to squares of the best move stored for key, or 0"""
+        i = key & self.mask
+        return self.moves[i] & MOVE_SQUARES if self.keys[i] == key else 0
+
+
+class SharedTranspositionTable:
+    """TranspositionTable laid out in a multiprocessing shared memory block so that worker processes can share it.
+    Each slot is three 64-bit words: key ^ score bits ^ info, the score as a double, and the info word (move code,
+    depth + 1, bound, age). Writers never lock; a reader only trusts a slot whose first word XORs back to its key,
+    so a slot torn by two processes writing at once reads as a miss instead of a wrong result."""
+    ENTRY_BYTES = 24
+    SCORE = struct.Struct('<d')
+
+    def __init__(self, sizeMB=TT_SIZE_MB, name=None):
+        slots = 1
+        while slots * 2 * self.ENTRY_BYTES <= sizeMB * 1024 * 1024:
+            slots *= 2
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=slots * self.ENTRY_BYTES)
+            self.owner = True
+        else:
+            self.memory = attachSharedMemory(name)
+            self.owner = False
+            slots = self.memory.size // self.ENTRY_BYTES
+            slots = 1 << (slots.bit_length() - 1)
+        self.name = self.memory.name
+        self.size = slots
+        self.mask = slots - 1
+        self.words = self.memory.buf.cast('Q')
+        self.age = 0
+        self.probes = self.hits = self.stores = 0
+        if self.owner:
+            self.clear()
+
+    def clear(self):
+        self.memory.buf[:self.size * self.ENTRY_BYTES] = bytes(self.size * self.ENTRY_BYTES)
+        self.age = 0
+
+    def newSearch(self):
+        """Start a new age and reset this process's probe, hit and store counts"""
+        self.age = (self.age + 1) & 0xFF
+        self.probes = self.hits = self.stores = 0
+
+    def close(self):
+        """Detach from the block, and free it if this table created it"""
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def read(self, key):
+        i = (key & self.mask) * 3
+        words = self.words
+        check, scoreBits, info = words[i], words[i + 1], words[i + 2]
+        if check ^ scoreBits ^ info != key or not (info >> 25) & 0xFF:
+            return None
+        return scoreBits, info
+
+    def probe(self, key):
+        """(depth, bound, score, move code) stored for key, or None"""
+        self.probes += 1
+        entry = self.read(key)
+        if entry is None:
+            return None
+        self.hits += 1
+        scoreBits, info = entry
+        score = self.SCORE.unpack(scoreBits.to_bytes(8, 'little'))[0]
+        return ((info >> 25) & 0xFF) - 1, (info >> 33) & 3, score, info & 0x1FFFFFF
+
+    def store(self, key, depth, bound, score, moveCode):
+        i = (key & self.mask) * 3
+        words = self.words
+        oldInfo = words[i + 2]
+        sameKey = words[i] ^ words[i + 1] ^ oldInfo == key
+        if sameKey or (oldInfo >> 35) != self.age or depth >= ((oldInfo >> 25) & 0xFF) - 1:
+            self.stores += 1
+            if moveCode == 0 and sameKey:
+                moveCode = oldInfo & 0x1FFFFFF
+            scoreBits = int.from_bytes(self.SCORE.pack(score), 'little')
+            info = moveCode | (depth + 1) << 25 | bound << 33 | self.age << 35
+            words[i + 1] = scoreBits
+            words[i + 2] = info
+            words[i] = key ^ scoreBits ^ info
+
+    def hashMove(self, key):
+        """From/to squares of the best move stored for key, or 0"""
+        entry = self.read(key)
+        return entry[1] & MOVE_SQUARES if entry is not None else 0
+
+
+def attachSharedMemory(name):
+    try:
+        # Python 3.13+: only the creating process should track (and eventually unlink) the block
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class PawnTable:
+    """Pawn structure scores keyed on GameState.pawnZobrist; a new entry always replaces the old one in its slot"""
+
+    def __init__(self, size=PAWN_TABLE_SIZE):
+        self.size = size
+        self.mask = size - 1
+        self.clear()
+
+    def clear(self):
+        self.keys = array('Q', [0]) * self.size
+        self.scores = array('d', [0.0]) * self.size
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key):
+        i = key & self.mask
+        if self.keys[i] == key:
+            self.hits += 1
+            return self.scores[i]
+        self.misses += 1
+        return None
+
+    def store(self, key, score):
+        i = key & self.mask
+        self.keys[i] = key
+        self.scores[i] = score
+
+
+transpositionTable = TranspositionTable()
+pawnTable = PawnTable()
+# Quiet moves (from/to codes) that caused a beta cutoff, two per ply, and cutoff credit per from/to pair
+killerMoves = [[0, 0] for _ in range(MAX_PLY)]
+historyTable = array('l', [0]) * 4096
+nodeCount = 0
+cutoffCount = 0
+firstMoveCutoffCount = 0
+# Nodes answered straight from the transposition table
+ttCutoffCount = 0
+# Null-window searches and how many were searched again with the full window, and the same for aspiration windows
+nullWindowCount = 0
+researchCount = 0
+aspirationCount = 0
+aspirationFailCount = 0
+# Null-move searches and their cutoffs, and reduced searches and how many were searched again at full depth
+nullMoveCount = 0
+nullMoveCutoffCount = 0
+reductionCount = 0
+reductionResearchCount = 0
+searchRootPly = 0
+searchDeadline = None
+searchNodeLimit = None
+searchId = 0
+searchDepth = 0
+# Wall-clock time the running search must finish by, or None while it is unbounded (pondering)
+searchEndTime = None
+# Process pool for workers=N searches, kept between moves so each worker's tables stay warm, with the
+# shared alpha, stop flag and transposition table handed to every worker
+workerPool = None
+workerPoolSize = 0
+sharedAlpha = None
+sharedStop = None
+sharedTable = None
+# Set inside worker processes only
+stopSignal = None
+workerSearchId = None
+# Background search (SearchTask) currently running, and the event that cancels it
+activeSearch = None
+cancelEvent = None
+# SearchStats of the most recent findBestMove call
+lastSearchStats = None
+# Opening book findBestMove plays from before searching (see loadOpeningBook)
+openingBook = None
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search once the time or node budget is spent"""
+
+
+class SearchStats:
+    """What one findBestMove call did: completed depth, best move and score (in pawns, from White's side), nodes and
+    time, and the counters of the transposition table, cutoffs, re-searches and pruning. Filled in after every
+    completed depth and once more when the search stops. With workers the nodes and per-depth node counts cover
+    all processes, and the counters, which only exist inside each worker, are None."""
 
+    def __init__(self, fen, timeLimitMs=None, nodeLimit=None, workers=1, ponder=False):
+        self.fen = fen
+        self.timeLimitMs = timeLimitMs
+        self.nodeLimit = nodeLimit
+        self.workers = workers
+        self.ponder = ponder
+        self.depth = 0
+        self.bestMove = None
+        self.score = 0.0
+        self.nodes = 0
+        self.elapsed = 0.0
+        # Nodes searched by each completed depth, for the branching factor
+        self.iterationNodes = []
+        counter = 0 if workers == 1 else None
+        self.ttProbes = self.ttHits = self.ttStores = self.ttCutoffs = counter
+        self.cutoffs = self.firstMoveCutoffs = counter
+        self.nullWindowSearches = self.researches = counter
+        self.aspirationSearches = self.aspirationFails = counter
+        self.nullMoves = self.nullMoveCutoffs = counter
+        self.reductions = self.reductionResearches = counter
+        # True when the move came from the opening book without a search
+        self.fromBook = False
+        # True when the budget ran out or the search was cancelled in the middle of a depth
+        self.aborted = False
 
-pst = {
-    'p': [
-        [0, 0, 0, 0, 0, 0, 0, 0],
-        [5, 5, 5, 5, 5, 5, 5, 5],
-        [1, 1, 2, 3, 3, 2, 1, 1],
-        [0.5, 0.5, 1, 2.5, 2.5, 1, 0.5, 0.5],
-        [0, 0, 0, 2, 2, 0, 0, 0],
-        [0.5, -0.5, -1, 0, 0, -1, -0.5, 0.5],
-        [0.5, 1, 1, -2, -2, 1, 1, 0.5],
-        [0, 0, 0, 0, 0, 0, 0, 0]
-    ],
-    'N': [
-        [-5, -4, -3, -3, -3, -3, -4, -5],
-        [-4, -2, 0, 0.5, 0.5, 0, -2, -4],
-        [-3, 0.5, 1, 1.5, 1.5, 1, 0.5, -3],
-        [-3, 0, 1.5, 2, 2, 1.5, 0, -3],
-        [-3, 0.5, 1.5, 2, 2, 1.5, 0.5, -3],
-        [-3, 0, 1, 1.5, 1.5, 1, 0, -3],
-        [-4, -2, 0, 0, 0, 0, -2, -4],
-        [-5, -4, -3, -3, -3, -3, -4, -5]
-    ],
-    'B': [
-        [-2, -1, -1, -1, -1, -1, -1, -2],
-        [-1, 0, 0, 0, 0, 0, 0, -1],
-        [-1, 0, 0.5, 1, 1, 0.5, 0, -1],
-        [-1, 0.5, 0.5, 1, 1, 0.5, 0.5, -1],
-        [-1, 0, 1, 1, 1, 1, 0, -1],
-        [-1, 1, 1, 1, 1, 1, 1, -1],
-        [-1, 0.5, 0, 0, 0, 0, 0.5, -1],
-        [-2, -1, -1, -1, -1, -1, -1, -2]
-    ],
-    'R': [
-        [0, 0, 0, 0, 0, 0, 0, 0],
-        [0.5, 1, 1, 1, 1, 1, 1, 0.5],
-        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-        [0, 0, 0, 0.5, 0.5, 0, 0, 0]
-    ],
-    'Q': [
-        [-2, -1, -1, -0.5, -0.5, -1, -1, -2],
-        [-1, 0, 0, 0, 0, 0, 0, -1],
-        [-1, 0, 0.5, 0.5, 0.5, 0.5, 0, -1],
-        [-0.5, 0, 0.5, 0.5, 0.5, 0.5, 0, -0.5],
-        [0, 0, 0.5, 0.5, 0.5, 0.5, 0, -0.5],
-        [-1, 0.5, 0.5, 0.5, 0.5, 0.5, 0, -1],
-        [-1, 0, 0.5, 0, 0, 0, 0, -1],
-        [-2, -1, -1, -0.5, -0.5, -1, -1, -2]
-    ],
-    'K': [
-        [-3, -4, -4, -5, -5, -4, -4, -3],
-        [-3, -4, -4, -5, -5, -4, -4, -3],
-        [-3, -4, -4, -5, -5, -4, -4, -3],
-        [-3, -4, -4, -5, -5, -4, -4, -3],
-        [-2, -3, -3, -4, -4, -3, -3, -2],
-        [-1, -2, -2, -2, -2, -2, -2, -1],
-        [2, 2, 0, 0, 0, 0, 2, 2],
-        [2, 3, 1, 0, 0, 1, 3, 2]
-    ]
-}
-
-
-pst_endgame_king = [
-    [-5, -4, -3, -2, -2, -3, -4, -5],
-    [-3, -2, -1, 0, 0, -1, -2, -3],
-    [-3, -1, 2, 3, 3, 2, -1, -3],
-    [-3, -1, 3, 4, 4, 3, -1, -3],
-    [-3, -1, 3, 4, 4, 3, -1, -3],
-    [-3, -1, 2, 3, 3, 2, -1, -3],
-    [-3, -3, 0, 0, 0, 0, -3, -3],
-    [-5, -3, -3, -3, -3, -3, -3, -5]
-]
-
-transpositionTable = {}
-
-def findBestMove(gs, validMoves):
-    global nextMove, transpositionTable
+    @property
+    def nps(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def ttHitRate(self):
+        return shareOf(self.ttHits, self.ttProbes)
+
+    @property
+    def firstMoveCutoffRate(self):
+        """Share of beta cutoffs that came from the first move tried"""
+        return shareOf(self.firstMoveCutoffs, self.cutoffs)
+
+    @property
+    def researchRate(self):
+        """Share of principal variation null-window searches that failed high and were searched again"""
+        return shareOf(self.researches, self.nullWindowSearches)
+
+    @property
+    def aspirationFailRate(self):
+        """Share of aspiration window root searches that failed high or low"""
+        return shareOf(self.aspirationFails, self.aspirationSearches)
+
+    @property
+    def branchingFactor(self):
+        """Effective branching factor: nodes of the last completed depth over those of the depth before"""
+        if len(self.iterationNodes) < 2 or not self.iterationNodes[-2]:
+            return 0.0
+        return self.iterationNodes[-1] / self.iterationNodes[-2]
+
+    def update(self, startTime):
+        """Copy the search counters as they stand now"""
+        self.elapsed = time.perf_counter() - startTime
+        self.nodes = nodeCount
+        if self.workers > 1:
+            return
+        table = transpositionTable
+        self.ttProbes, self.ttHits, self.ttStores = table.probes, table.hits, table.stores
+        self.ttCutoffs = ttCutoffCount
+        self.cutoffs, self.firstMoveCutoffs = cutoffCount, firstMoveCutoffCount
+        self.nullWindowSearches, self.researches = nullWindowCount, researchCount
+        self.aspirationSearches, self.aspirationFails = aspirationCount, aspirationFailCount
+        self.nullMoves, self.nullMoveCutoffs = nullMoveCount, nullMoveCutoffCount
+        self.reductions, self.reductionResearches = reductionCount, reductionResearchCount
+
+    def asDict(self):
+        """Plain dictionary of the counters and the rates worked out from them, ready for json"""
+        stats = dict(vars(self))
+        stats['bestMove'] = self.bestMove.getChessNotation() if self.bestMove is not None else None
+        for name in ('nps', 'ttHitRate', 'firstMoveCutoffRate', 'researchRate', 'aspirationFailRate',
+                     'branchingFactor'):
+            stats[name] = getattr(self, name)
+        return stats
+
+
+def shareOf(count, total):
+    """count / total, 0.0 when total is 0 and None when the counters were not kept"""
+    if total is None:
+        return None
+    return count / total if total else 0.0
+
+
+def logSearchStats(stats, path):
+    """Append stats to the JSONL file at path as one line, stamped with the wall-clock time"""
+    record = {'time': time.time()}
+    record.update(stats.asDict())
+    with open(path, 'a') as logFile:
+        logFile.write(json.dumps(record) + '\n')
+
+
+class SearchTask:
+    """findBestMove running on a background thread against a copy of the position, so the caller's loop keeps
+    running. Poll done(), then take result(); cancel() stops the search and waits for the thread to exit.
+    Only one search runs at a time, so starting a task cancels the previous one.
+    With ponder=True the task searches on the opponent's time: it plays the reply the transposition table
+    predicts (ponderMove, or None to search the opponent's position and warm the table for every reply) and
+    deepens without a budget until ponderHit() or cancel()."""
+
+    def __init__(self, gs, timeLimitMs=None, nodeLimit=None, ponder=False):
+        global activeSearch
+        if activeSearch is not None:
+            activeSearch.cancel()
+        self.position = GameState.fromFEN(gs.toFEN())
+        self.pondering = ponder
+        self.ponderMove = None
+        if ponder:
+            squares = transpositionTable.hashMove(self.position.zobrist)
+            self.ponderMove = self.position.findMove(squares, True) if squares else None
+            if self.ponderMove is not None:
+                self.position.makeMove(self.ponderMove)
+        # Key of the searched position, read by the caller while the search thread moves self.position around
+        self.key = self.position.zobrist
+        self.startTime = time.perf_counter()
+        self.cancelled = threading.Event()
+        self.move = None
+        self.stats = None
+        self.thread = threading.Thread(target=self.run, args=(timeLimitMs, nodeLimit), daemon=True)
+        activeSearch = self
+        self.thread.start()
+
+    def run(self, timeLimitMs, nodeLimit):
+        global cancelEvent
+        cancelEvent = self.cancelled
+        try:
+            move = findBestMove(self.position, self.position.getValidMoves(), timeLimitMs, nodeLimit,
+                                ponder=self.pondering)
+        finally:
+            cancelEvent = None
+        self.stats = lastSearchStats
+        if not self.cancelled.is_set():
+            self.move = move
+
+    def isPonderHit(self, gs):
+        """True if gs is the position this ponder search is working on"""
+        return self.pondering and self.ponderMove is not None and gs.zobrist == self.key
+
+    def ponderHit(self, timeLimitMs):
+        """The predicted reply was played: keep the search going, now against the clock. The time spent pondering
+        counts toward timeLimitMs, so after a long ponder the best move of the last finished depth comes back at
+        once."""
+        global searchEndTime, searchDeadline
+        self.pondering = False
+        endTime = max(time.perf_counter(), self.startTime + timeLimitMs / 1000)
+        if activeSearch is self and not self.done():
+            searchEndTime = endTime
+            # Until the first depth completes the search ignores deadlines and picks searchEndTime up afterwards
+            if searchDepth > 0:
+                searchDeadline = endTime
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    def result(self):
+        """Best move found, or None while the search runs or if it was cancelled"""
+        return self.move if self.done() else None
+
+    def cancel(self):
+        global activeSearch
+        self.cancelled.set()
+        self.thread.join()
+        if activeSearch is self:
+            activeSearch = None
+
+
+def findBestMove(gs, validMoves, timeLimitMs=None, nodeLimit=None, workers=None, lazySMP=False, ponder=False,
+                 onIteration=None):
+    """Iterative deepening search. Without limits it stops at DEPTH; with timeLimitMs or nodeLimit it keeps
+    deepening until the budget runs out and returns the best move of the last completed depth.
+    With workers=N (N > 1) the root moves of each iteration are split across N processes, or with lazySMP=True
+    all N processes search the whole position and share one transposition table.
+    With ponder=True it deepens until cancelled or until SearchTask.ponderHit() sets a deadline.
+    The search's SearchStats are left in lastSearchStats, passed to onIteration after every completed depth
+    and appended to SEARCH_LOG_PATH when that is set. A position in the opening book gets a book move at once."""
+    global nextMove, transpositionTable, nodeCount, cutoffCount, firstMoveCutoffCount, searchDeadline, searchNodeLimit
+    global searchId, searchDepth, searchEndTime, nullWindowCount, researchCount, aspirationCount, aspirationFailCount
+    global nullMoveCount, nullMoveCutoffCount, reductionCount, reductionResearchCount, ttCutoffCount, lastSearchStats
     nextMove = None
+    searchId += 1
     random.shuffle(validMoves)
-    transpositionTable.clear()
-    alphaBeta(gs, DEPTH, -CHECKMATE, CHECKMATE, 1 if gs.whiteToMove else -1)
+    transpositionTable.newSearch()
+    ageHistory()
+    nodeCount = 0
+    cutoffCount = 0
+    firstMoveCutoffCount = 0
+    ttCutoffCount = 0
+    nullWindowCount = 0
+    researchCount = 0
+    aspirationCount = 0
+    aspirationFailCount = 0
+    nullMoveCount = 0
+    nullMoveCutoffCount = 0
+    reductionCount = 0
+    reductionResearchCount = 0
+    searchDeadline = None
+    searchNodeLimit = None
+    limited = ponder or timeLimitMs is not None or nodeLimit is not None
+    startTime = time.perf_counter()
+    searchEndTime = startTime + timeLimitMs / 1000 if timeLimitMs is not None else None
+    rootMoves = list(validMoves)
+    orderMoves(gs, rootMoves)
+    putHashMoveFirst(rootMoves, transpositionTable.hashMove(gs.zobrist))
+    rootPly = len(gs.moveLog)
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    parallel = workers is not None and workers > 1 and len(rootMoves) > 1
+    searchDepth = 0
+    score = 0
+    stats = SearchStats(gs.toFEN(), timeLimitMs, nodeLimit, workers if parallel else 1, ponder)
+    lastSearchStats = stats
+    if openingBook is not None:
+        bookMove = openingBook.pickMove(gs, validMoves)
+        if bookMove is not None:
+            nextMove = stats.bestMove = bookMove
+            stats.fromBook = True
+            finishStats(stats, startTime)
+            return nextMove
+    if parallel and lazySMP:
+        maxDepth = MAX_DEPTH if limited else DEPTH
+        score, nextMove, stats.iterationNodes = searchLazySMP(gs, rootMoves, workers, maxDepth, timeLimitMs, nodeLimit)
+        stats.depth, stats.bestMove, stats.score = searchDepth, nextMove, score * turnMultiplier
+        # Workers stop early only on a mate or when the time or node budget runs out
+        stats.aborted = searchDepth < maxDepth and abs(score) < CHECKMATE
+        stats.update(startTime)
+        # The workers report only their final result, so there is one call for the depth the winner completed
+        if onIteration is not None and nextMove is not None:
+            onIteration(stats)
+        finishStats(stats, startTime)
+        return nextMove
+
+    for depth in range(1, (MAX_DEPTH if limited else DEPTH) + 1):
+        iterationStart = nodeCount
+        try:
+            if parallel:
+                score, move = searchRootParallel(gs, rootMoves, depth, workers)
+            else:
+                score, move = searchAspiration(gs, rootMoves, depth, turnMultiplier, score)
+        except SearchTimeout:
+            # Null moves first: undoing the real moves after them restores the root position exactly
+            while gs.nullMoveHistory:
+                gs.undoNullMove()
+            while len(gs.moveLog) > rootPly:
+                gs.undoMove()
+            stats.aborted = True
+            break
+        if move is None:
+            break
+        nextMove = move
+        searchDepth = depth
+        rootMoves.remove(move)
+        rootMoves.insert(0, move)
+        stats.depth, stats.bestMove, stats.score = depth, move, score * turnMultiplier
+        stats.iterationNodes.append(nodeCount - iterationStart)
+        stats.update(startTime)
+        if onIteration is not None:
+            onIteration(stats)
+        if abs(score) >= CHECKMATE:
+            break
+        # The first iteration always completes so there is a move to return; budgets apply from then on
+        if searchEndTime is not None:
+            searchDeadline = searchEndTime
+            if time.perf_counter() >= searchDeadline:
+                break
+        if nodeLimit is not None:
+            searchNodeLimit = nodeLimit
+            if nodeCount >= nodeLimit:
+                break
+    finishStats(stats, startTime)
     return nextMove
 
-def alphaBeta(gs, depth, alpha, beta, turnMultiplier):
-    global nextMove, transpositionTable
+def finishStats(stats, startTime):
+    """Final update of a search's stats, logged to SEARCH_LOG_PATH when set"""
+    stats.update(startTime)
+    if SEARCH_LOG_PATH is not None:
+        logSearchStats(stats, SEARCH_LOG_PATH)
+
+def loadOpeningBook(path):
+    """Play from the Polyglot-format book at path (see ChessBook) before searching; None goes back to searching
+    every move"""
+    global openingBook
+    if openingBook is not None:
+        openingBook.close()
+    openingBook = OpeningBook(path) if path is not None else None
+
+def searchRootParallel(gs, rootMoves, depth, workers):
+    """searchRoot with the root moves spread over a pool of worker processes. Each task ships the position as FEN
+    plus the move code; workers share the best score so far as their alpha. The nodes left under the node limit are
+    split evenly between the root moves, so the limit stays a total. Raises SearchTimeout if any move ran out of
+    budget, since the iteration is then incomplete."""
+    global nodeCount
+    pool = getWorkerPool(workers)
+    sharedAlpha.value = -CHECKMATE - 1
+    fen = gs.toFEN()
+    # perf_counter values are not comparable between processes, so the deadline travels as wall-clock time
+    deadline = None if searchDeadline is None else time.time() + searchDeadline - time.perf_counter()
+    nodesLeft = None if searchNodeLimit is None else max((searchNodeLimit - nodeCount) // len(rootMoves), 1)
+    tasks = [(fen, move.code, depth, searchId, deadline, nodesLeft) for move in rootMoves]
+    results = pool.map(searchRootMove, tasks, chunksize=1)
+    nodeCount += sum(nodes for _, nodes in results)
+    if any(score is None for score, _ in results):
+        raise SearchTimeout()
+    # Highest score wins; ties go to the earlier root move, so the result does not depend on worker timing
+    bestIndex = max(range(len(rootMoves)), key=lambda i: (results[i][0], -i))
+    return results[bestIndex][0], rootMoves[bestIndex]
+
+def searchLazySMP(gs, rootMoves, workers, maxDepth, timeLimitMs, nodeLimit):
+    """Lazy SMP: every worker runs its own iterative deepening on the whole position (lazySMPWorker), and they
+    help each other only through the shared transposition table. Stops everyone once a worker completes maxDepth
+    or finds a mate; the deepest completed iteration wins, worker 0 breaking ties. A node limit is split evenly
+    between the workers.
+    Returns (score, best move, nodes of each depth the winning worker completed)."""
+    global nodeCount, searchDepth
+    pool = getWorkerPool(workers)
+    sharedStop.value = 0
+    fen = gs.toFEN()
+    deadline = None if timeLimitMs is None else time.time() + timeLimitMs / 1000
+    codes = [move.code for move in rootMoves]
+    workerNodeLimit = None if nodeLimit is None else max(nodeLimit // workers, 1)
+    tasks = [(fen, codes, index, maxDepth, searchId, deadline, workerNodeLimit) for index in range(workers)]
+    results = [(0, 0, 0, [])] * workers
+    for index, depth, score, code, nodes, iterationNodes in pool.imap_unordered(lazySMPWorker, tasks):
+        results[index] = (depth, score, code, iterationNodes)
+        nodeCount += nodes
+        if depth >= maxDepth or (depth and abs(score) >= CHECKMATE):
+            sharedStop.value = 1
+    sharedStop.value = 0
+    best = max(range(workers), key=lambda i: (results[i][0], -i))
+    depth, score, code, iterationNodes = results[best]
+    searchDepth = depth
+    for move in rootMoves:
+        if move.code & MOVE_SQUARES == code & MOVE_SQUARES:
+            return score, move, iterationNodes
+    return score, None, iterationNodes
+
+def lazySMPWorker(task):
+    """Worker side of searchLazySMP: (worker index, completed depth, score, move code, nodes, nodes of each completed
+    depth). Odd-numbered workers start one ply deeper and helpers rotate the root moves after the first, so the
+    workers spread over different parts of the tree instead of repeating each other's work."""
+    global nodeCount, searchDeadline, searchNodeLimit
+    fen, codes, index, maxDepth, taskSearchId, deadline, nodeLimit = task
+    transpositionTable.age = taskSearchId & 0xFF
+    ageHistory()
+    gs = GameState.fromFEN(fen)
+    rootMoves = [gs.findMove(code & MOVE_SQUARES, True) for code in codes]
+    if index and len(rootMoves) > 2:
+        shift = index % (len(rootMoves) - 1)
+        rootMoves = rootMoves[:1] + rootMoves[1 + shift:] + rootMoves[1:1 + shift]
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    nodeCount = 0
+    searchNodeLimit = nodeLimit
+    workerDeadline = None if deadline is None else time.perf_counter() + deadline - time.time()
+    # Worker 0 always finishes depth 1, so there is a move to play however short the time limit
+    searchDeadline = workerDeadline if index else None
+    completed, bestScore, bestCode = 0, 0, 0
+    iterationNodes = []
+    for depth in range(1 + index % 2, maxDepth + 1):
+        iterationStart = nodeCount
+        try:
+            score, move = searchAspiration(gs, rootMoves, depth, turnMultiplier, bestScore)
+        except SearchTimeout:
+            break
+        completed, bestScore, bestCode = depth, score, move.code
+        iterationNodes.append(nodeCount - iterationStart)
+        rootMoves.remove(move)
+        rootMoves.insert(0, move)
+        if abs(score) >= CHECKMATE:
+            break
+        searchDeadline = workerDeadline
+        if searchDeadline is not None and time.perf_counter() >= searchDeadline:
+            break
+    return index, completed, bestScore, bestCode, nodeCount, iterationNodes
+
+def getWorkerPool(workers):
+    """The shared process pool, recreated if a different worker count is asked for"""
+    global workerPool, workerPoolSize, sharedAlpha, sharedStop, sharedTable
+    if workerPool is None or workerPoolSize != workers:
+        shutdownWorkers()
+        sharedAlpha = multiprocessing.Value('d', -CHECKMATE - 1)
+        sharedStop = multiprocessing.Value('b', 0)
+        sharedTable = SharedTranspositionTable()
+        workerPool = multiprocessing.Pool(workers, initializer=initWorker,
+                                          initargs=(sharedAlpha, sharedStop, sharedTable.name))
+        workerPoolSize = workers
+    return workerPool
+
+def shutdownWorkers():
+    """Stop the worker processes started by a workers=N search and free their shared table"""
+    global workerPool, workerPoolSize, sharedTable
+    if workerPool is not None:
+        workerPool.terminate()
+        workerPool.join()
+        workerPool = None
+        workerPoolSize = 0
+    if sharedTable is not None:
+        sharedTable.close()
+        sharedTable = None
+
+def initWorker(alpha, stop, tableName):
+    global sharedAlpha, stopSignal, transpositionTable
+    sharedAlpha = alpha
+    stopSignal = stop
+    transpositionTable = SharedTranspositionTable(name=tableName)
+
+def searchRootMove(task):
+    """Worker side of searchRootParallel: (score, nodes) for one root move, or (None, nodes) when the budget ran out"""
+    global nodeCount, searchDeadline, searchNodeLimit, searchRootPly, workerSearchId
+    fen, code, depth, taskSearchId, deadline, nodesLeft = task
+    if deadline is not None and time.time() >= deadline:
+        return None, 0
+    if taskSearchId != workerSearchId:
+        workerSearchId = taskSearchId
+        transpositionTable.age = taskSearchId & 0xFF
+        ageHistory()
+    gs = GameState.fromFEN(fen)
+    move = gs.findMove(code & MOVE_SQUARES, True)
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    nodeCount = 0
+    searchDeadline = None if deadline is None else time.perf_counter() + deadline - time.time()
+    searchNodeLimit = nodesLeft
+    searchRootPly = len(gs.moveLog)
+    alpha = max(sharedAlpha.value - ROOT_SPLIT_MARGIN, -CHECKMATE)
+    gs.makeMove(move)
+    try:
+        score = -alphaBeta(gs, depth - 1, -CHECKMATE, -alpha, -turnMultiplier)
+    except SearchTimeout:
+        return None, nodeCount
+    with sharedAlpha.get_lock():
+        if score > sharedAlpha.value:
+            sharedAlpha.value = score
+    return score, nodeCount
+
+def ageHistory():
+    """Forget the killers and halve the history scores so older searches count for less"""
+    for killers in killerMoves:
+        killers[0] = killers[1] = 0
+    for i in range(4096):
+        historyTable[i] >>= 1
+
+def searchAspiration(gs, rootMoves, depth, turnMultiplier, previousScore):
+    """searchRoot inside a window around the previous iteration's score, widened and searched again whenever the
+    score falls outside it"""
+    global aspirationCount, aspirationFailCount
+    if depth < ASPIRATION_MIN_DEPTH or abs(previousScore) >= CHECKMATE:
+        return searchRoot(gs, rootMoves, depth, turnMultiplier)
+    window = ASPIRATION_WINDOW
+    alpha = max(previousScore - window, -CHECKMATE)
+    beta = min(previousScore + window, CHECKMATE)
+    while True:
+        aspirationCount += 1
+        score, move = searchRoot(gs, rootMoves, depth, turnMultiplier, alpha, beta)
+        # A fail against a bound already at a mate score is exact: no score lies beyond +-CHECKMATE
+        if alpha < score < beta or score >= beta >= CHECKMATE or score <= alpha <= -CHECKMATE:
+            return score, move
+        aspirationFailCount += 1
+        window *= 2
+        if score <= alpha:
+            alpha = max(score - window, -CHECKMATE)
+        else:
+            beta = min(score + window, CHECKMATE)
+            # Search the move that failed high first next time
+            rootMoves.remove(move)
+            rootMoves.insert(0, move)
+
+def searchRoot(gs, rootMoves, depth, turnMultiplier, alpha=-CHECKMATE, beta=CHECKMATE):
+    """Search every root move to depth, previous best first; returns (score, best move). A score at or below alpha
+    or at or above beta is only a bound, as in alphaBeta."""
+    global searchRootPly, nullWindowCount, researchCount
+    searchRootPly = len(gs.moveLog)
+    alphaOrig = alpha
+    bestScore = -CHECKMATE - 1
+    bestMove = None
+    for move in rootMoves:
+        gs.makeMove(move)
+        if bestMove is None:
+            score = -alphaBeta(gs, depth - 1, -beta, -alpha, -turnMultiplier)
+        else:
+            nullWindowCount += 1
+            score = -alphaBeta(gs, depth - 1, -alpha - NULL_WINDOW, -alpha, -turnMultiplier)
+            if alpha < score < beta:
+                researchCount += 1
+                score = -alphaBeta(gs, depth - 1, -beta, -alpha, -turnMultiplier)
+        gs.undoMove()
+        if score > bestScore:
+            bestScore = score
+            bestMove = move
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            break
+    transpositionTable.store(gs.zobrist, depth, ttBound(bestScore, alphaOrig, beta), bestScore,
+                             bestMove.code if bestMove else 0)
+    return bestScore, bestMove
+
+def countNode():
+    """Count a searched node and stop the search once the time or node budget is spent"""
+    global nodeCount
+    nodeCount += 1
+    if nodeCount % TIME_CHECK_INTERVAL == 0:
+        if searchDeadline is not None and time.perf_counter() >= searchDeadline:
+            raise SearchTimeout()
+        if stopSignal is not None and stopSignal.value:
+            raise SearchTimeout()
+        if cancelEvent is not None and cancelEvent.is_set():
+            raise SearchTimeout()
+    if searchNodeLimit is not None and nodeCount >= searchNodeLimit:
+        raise SearchTimeout()
+
+def alphaBeta(gs, depth, alpha, beta, turnMultiplier, nullAllowed=True):
+    global cutoffCount, firstMoveCutoffCount, nullWindowCount, researchCount, ttCutoffCount
+    global nullMoveCount, nullMoveCutoffCount, reductionCount, reductionResearchCount
+    countNode()
     
-    # Check transposition table
-    boardHash = hashBoard(gs)
-    if boardHash in transpositionTable and transpositionTable[boardHash][1] >= depth:
-        return transpositionTable[boardHash][0]
+    # Check transposition table; a stored score only answers this node if its bound allows it
+    boardHash = gs.zobrist
+    entry = transpositionTable.probe(boardHash)
+    if entry is not None and entry[0] >= depth:
+        _, bound, ttScore, _ = entry
+        if bound == TT_EXACT or (bound == TT_LOWER and ttScore >= beta) or (bound == TT_UPPER and ttScore <= alpha):
+            ttCutoffCount += 1
+            return ttScore
     
+    alphaOrig = alpha
     if depth == 0:
-        score = turnMultiplier * evaluateBoard(gs)
-        transpositionTable[boardHash] = (score, 0)
+        score = quiescence(gs, alpha, beta, turnMultiplier)
+        transpositionTable.store(boardHash, 0, ttBound(score, alphaOrig, beta), score, 0)
         return score
     
-    maxScore = -CHECKMATE
-    validMoves = gs.getValidMoves()
+    inCheck = gs.inCheck()
+    # Windows are built as (-alpha - NULL_WINDOW, -alpha) in float pawns, so the width of a null window is only
+    # NULL_WINDOW up to rounding
+    nullWindow = beta - alpha < 2 * NULL_WINDOW
+    # Null-move pruning, only in null-window searches and never twice in a row. A side with nothing but pawns may
+    # be in zugzwang, where passing would be its best move, so it never passes
+    if (NULL_MOVE_PRUNING and nullAllowed and depth >= NULL_MOVE_MIN_DEPTH and nullWindow
+            and not inCheck and abs(beta) < CHECKMATE and gs.hasNonPawnMaterial('w' if gs.whiteToMove else 'b')
+            and turnMultiplier * evaluateBoard(gs) >= beta):
+        nullMoveCount += 1
+        gs.makeNullMove()
+        score = -alphaBeta(gs, depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + NULL_WINDOW, -turnMultiplier, False)
+        gs.undoNullMove()
+        if score >= beta:
+            nullMoveCutoffCount += 1
+            return score if score < CHECKMATE else beta
     
-    if len(validMoves) == 0:
-        if gs.inCheck():
-            return -CHECKMATE
-        else:
-            return STALEMATE
-    
-    orderMoves(gs, validMoves)
+    maxScore = -CHECKMATE
+    bestMove = None
+    hashMove = entry[3] & MOVE_SQUARES if entry is not None else 0
+    killers = killerMoves[min(len(gs.moveLog) - searchRootPly, MAX_PLY - 1)]
+    movesSearched = 0
     
-    for move in validMoves:
+    # Moves come in stages, so a cutoff on the hash move or a capture never generates the quiet moves
+    for move in gs.getStagedMoves(hashMove, killers, historyTable):
         gs.makeMove(move)
-        score = -alphaBeta(gs, depth - 1, -beta, -alpha, -turnMultiplier)
+        if movesSearched == 0:
+            score = -alphaBeta(gs, depth - 1, -beta, -alpha, -turnMultiplier)
+        else:
+            # Late quiet moves that give no check are searched shallower first
+            reduction = 0
+            if (LATE_MOVE_REDUCTIONS and depth >= LMR_MIN_DEPTH and movesSearched >= LMR_MIN_MOVES and not inCheck
+                    and move.pieceCaptured == '--' and not move.isPawnPromotion
+                    and move.code & MOVE_SQUARES not in killers and not gs.inCheck()):
+                reduction = min(LMR_REDUCTION, depth - 1)
+                reductionCount += 1
+            # Principal variation search: a null window proves a later move no better than alpha, and only a move
+            # that beats it is searched again with the full window
+            nullWindowCount += 1
+            score = -alphaBeta(gs, depth - 1 - reduction, -alpha - NULL_WINDOW, -alpha, -turnMultiplier)
+            if reduction and score > alpha:
+                reductionResearchCount += 1
+                score = -alphaBeta(gs, depth - 1, -alpha - NULL_WINDOW, -alpha, -turnMultiplier)
+            if alpha < score < beta:
+                researchCount += 1
+                score = -alphaBeta(gs, depth - 1, -beta, -alpha, -turnMultiplier)
         gs.undoMove()
+        movesSearched += 1
         
-        if score > maxScore:
+        if score > maxScore or bestMove is None:
             maxScore = score
-            if depth == DEPTH:
-                nextMove = move
+            bestMove = move
         
         alpha = max(alpha, score)
         if alpha >= beta:
+            cutoffCount += 1
+            if movesSearched == 1:
+                firstMoveCutoffCount += 1
+            if move.pieceCaptured == '--' and not move.isPawnPromotion:
+                squares = move.code & MOVE_SQUARES
+                if killers[0] != squares:
+                    killers[1] = killers[0]
+                    killers[0] = squares
+                historyTable[squares] += depth * depth
             break
     
-    transpositionTable[boardHash] = (maxScore, depth)
+    if bestMove is None:
+        if inCheck:
+            return -CHECKMATE
+        else:
+            return STALEMATE
+    
+    transpositionTable.store(boardHash, depth, ttBound(maxScore, alphaOrig, beta), maxScore, bestMove.code if bestMove else 0)
     return maxScore
 
+def quiescence(gs, alpha, beta, turnMultiplier):
+    """Search captures and promotions until the position is quiet, so the horizon never cuts a trade in half"""
+    countNode()
+    if gs.inCheck():
+        # No standing pat while in check: every evasion is searched
+        moves = gs.getValidMoves()
+        if len(moves) == 0:
+            return -CHECKMATE
+        bestScore = -CHECKMATE
+        standPat = None
+    else:
+        standPat = turnMultiplier * evaluateBoard(gs)
+        if standPat >= beta:
+            return standPat
+        # Pruned moves could still reach alpha, so fail hard: a score below alpha would be stored as a false bound
+        if standPat + pieceScore['Q'] + DELTA_MARGIN < alpha:
+            return alpha
+        alpha = max(alpha, standPat)
+        bestScore = standPat
+        moves = gs.getCaptureMoves()
+    
+    orderMoves(gs, moves)
+    for move in moves:
+        if standPat is not None and not move.isPawnPromotion:
+            # Captures that lose material in the exchange cannot improve on standing pat
+            if standPat + pieceScore[move.pieceCaptured[1]] + DELTA_MARGIN < alpha or gs.isLosingCapture(move):
+                bestScore = max(bestScore, alpha)
+                continue
+        gs.makeMove(move)
+        score = -quiescence(gs, -beta, -alpha, -turnMultiplier)
+        gs.undoMove()
+        
+        if score > bestScore:
+            bestScore = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return bestScore
+
+def ttBound(score, alpha, beta):
+    """Bound type of a score searched with the window (alpha, beta)"""
+    if score <= alpha:
+        return TT_UPPER
+    if score >= beta:
+        return TT_LOWER
+    return TT_EXACT
+
+def putHashMoveFirst(moves, squares):
+    """Move the move whose from/to squares match the stored hash move to the front"""
+    if squares:
+        for i, move in enumerate(moves):
+            if move.code & MOVE_SQUARES == squares:
+                if i:
+                    moves.insert(0, moves.pop(i))
+                break
+
 def orderMoves(gs, moves):
     moveScores = []
     for move in moves:
         score = 0
-        # Prioritize captures
+        # Prioritize captures, except ones that lose material in the exchange
         if move.pieceCaptured != '--':
-            score += 10 * pieceScore.get(move.pieceCaptured[1], 0) - pieceScore.get(move.pieceMoved[1], 0)
+            if gs.isLosingCapture(move):
+                score += gs.see(move)
+            else:
+                score += 10 * pieceScore.get(move.pieceCaptured[1], 0) - pieceScore.get(move.pieceMoved[1], 0)
         
         # Prioritize pawn promotion
         if move.isPawnPromotion:
@@ -157,171 +978,69 @@ def orderMoves(gs, moves):
     moveScores.sort(reverse=True, key=lambda x: x[0])
     moves[:] = [move for _, move in moveScores]
 
-def hashBoard(gs):
-    """Simple board hashing for transposition table"""
-    return str(gs.board) + str(gs.whiteToMove)
-
 def evaluateBoard(gs):
     if gs.checkmate:
         return -CHECKMATE if gs.whiteToMove else CHECKMATE
     if gs.stalemate:
         return STALEMATE
     
-    score = 0
-    materialCount = 0
-    
-    for r in range(8):
-        for c in range(8):
-            piece = gs.board[r][c]
-            if piece == '--':
-                continue
-            
-            value = pieceScore.get(piece[1], 0)
-            materialCount += value
-            
-            
-            isEndgame = materialCount < 20
-            
-            
-            if piece[1] == 'K' and isEndgame:
-                pstBonus = pst_endgame_king[r][c] if piece[0] == 'w' else pst_endgame_king[7-r][c]
-            elif piece[1] in pst:
-                if piece[1] == 'p':
-                    pstBonus = pst[piece[1]][r][c] if piece[0] == 'w' else pst[piece[1]][7-r][c]
-                else:
-                    pstBonus = pst[piece[1]][r][c] if piece[0] == 'w' else pst[piece[1]][7-r][c]
-            else:
-                pstBonus = 0
-            
-            if piece[0] == 'w':
-                score += value + pstBonus * 0.1
-            else:
-                score -= value + pstBonus * 0.1
-    
+    # Material, position tables, center control and piece activity are kept up to date by makeMove/undoMove,
+    # blended between their middlegame and endgame versions by the game phase
+    mgScore, egScore, phase = gs.evalTerms
+    phase = min(phase, MAX_PHASE)
+    score = (mgScore * phase + egScore * (MAX_PHASE - phase)) / (MAX_PHASE * 100)
     
     score += kingSafety(gs) * 0.5
     score += mobility(gs) * 0.05
-    score += centerControl(gs) * 0.3
     score += pawnStructure(gs) * 0.2
-    score += pieceActivity(gs) * 0.1
     
     return score
 
 def kingSafety(gs):
-    """Evaluate king safety"""
-    kingPos = gs.whiteKingLocation if gs.whiteToMove else gs.blackKingLocation
-    row, col = kingPos
-    shield = 0
-    
-    
-    for dr in [-1, 0, 1]:
-        for dc in [-1, 0, 1]:
-            if dr == 0 and dc == 0:
-                continue
-            nr, nc = row + dr, col + dc
-            if 0 <= nr < 8 and 0 <= nc < 8:
-                piece = gs.board[nr][nc]
-                if piece != '--' and piece[0] == ('w' if gs.whiteToMove else 'b'):
-                    shield += 1
-    
-    
-    if row in [3, 4] and col in [3, 4]:
+    """Evaluate king safety for both kings, white minus black"""
+    return kingShield(gs, 'w') - kingShield(gs, 'b')
+
+def kingShield(gs, color):
+    """Friendly pieces around the king, less a penalty for a king standing in the center"""
+    kingSq = gs.bitboards[color + 'K'].bit_length() - 1
+    shield = popCount(KING_ATTACKS[kingSq] & gs.occupancy[color])
+    if (kingSq >> 3) in (3, 4) and (kingSq & 7) in (3, 4):
         shield -= 2
-    
-    return shield if gs.whiteToMove else -shield
+    return shield
 
 def mobility(gs):
-    """Count number of legal moves"""
-    numMoves = len(gs.getValidMoves())
-    return numMoves if gs.whiteToMove else -numMoves
-
-def centerControl(gs):
-    """Reward controlling center squares"""
-    center_squares = [(3, 3), (3, 4), (4, 3), (4, 4)]
-    extended_center = [(2, 2), (2, 3), (2, 4), (2, 5), (3, 2), (3, 5), 
-                       (4, 2), (4, 5), (5, 2), (5, 3), (5, 4), (5, 5)]
-    
-    score = 0
-    for r, c in center_squares:
-        piece = gs.board[r][c]
-        if piece != '--':
-            if piece[0] == 'w':
-                score += 0.5
-            else:
-                score -= 0.5
-    
-    for r, c in extended_center:
-        piece = gs.board[r][c]
-        if piece != '--':
-            if piece[0] == 'w':
-                score += 0.2
-            else:
-                score -= 0.2
-    
-    return score
+    """Squares White's pieces can reach minus squares Black's can, from attack bitboards"""
+    return gs.mobility('w') - gs.mobility('b')
 
 def pawnStructure(gs):
-    """Evaluate pawn structure"""
-    score = 0
-    
-    
-    for c in range(8):
-        white_pawns = []
-        black_pawns = []
-        for r in range(8):
-            if gs.board[r][c] == 'wp':
-                white_pawns.append(r)
-            elif gs.board[r][c] == 'bp':
-                black_pawns.append(r)
-        
-        if len(white_pawns) > 1:
-            score -= 0.5 * (len(white_pawns) - 1)
-        if len(black_pawns) > 1:
-            score += 0.5 * (len(black_pawns) - 1)
-    
-    
-    for c in range(8):
-        for r in range(8):
-            if gs.board[r][c][1] == 'p':
-                hasSupport = False
-                for dc in [-1, 1]:
-                    if 0 <= c + dc < 8:
-                        for dr in range(8):
-                            if gs.board[dr][c+dc][1] == 'p' and gs.board[dr][c+dc][0] == gs.board[r][c][0]:
-                                hasSupport = True
-                                break
-                
-                if not hasSupport:
-                    if gs.board[r][c][0] == 'w':
-                        score -= 0.3
-                    else:
-                        score += 0.3
-    
+    """Evaluate pawn structure, cached on the pawn-only Zobrist key since pawns rarely move during a search"""
+    key = gs.pawnZobrist
+    score = pawnTable.probe(key)
+    if score is None:
+        score = evaluatePawns(gs.bitboards['wp'], gs.bitboards['bp'])
+        pawnTable.store(key, score)
     return score
 
-def pieceActivity(gs):
-    """Reward pieces on active squares"""
+def evaluatePawns(whitePawns, blackPawns):
+    """Doubled, isolated and backward pawn penalties and passed pawn bonuses, White minus Black"""
     score = 0
-    
-    for r in range(8):
+    for color, own, enemy, sign in (('w', whitePawns, blackPawns, 1), ('b', blackPawns, whitePawns, -1)):
         for c in range(8):
-            piece = gs.board[r][c]
-            if piece == '--':
-                continue
-            
-            
-            if piece[1] == 'p':
-                if piece[0] == 'w' and r < 4:
-                    score += (6 - r) * 0.1
-                elif piece[0] == 'b' and r > 3:
-                    score -= (r - 1) * 0.1
-            
-            
-            if piece[0] == 'w' and r != 7 and piece[1] in ['N', 'B']:
-                score += 0.3
-            elif piece[0] == 'b' and r != 0 and piece[1] in ['N', 'B']:
-                score -= 0.3
-    
+            onFile = popCount(own & FILE_MASKS[c])
+            if onFile > 1:
+                score -= sign * DOUBLED_PAWN_PENALTY * (onFile - 1)
+        pawns = own
+        while pawns:
+            lsb = pawns & -pawns
+            sq = lsb.bit_length() - 1
+            pawns ^= lsb
+            r, c = sq >> 3, sq & 7
+            if not own & ADJACENT_FILE_MASKS[c]:
+                score -= sign * ISOLATED_PAWN_PENALTY
+            elif not own & PAWN_SUPPORT_MASKS[color][sq] and enemy & STOP_ATTACK_MASKS[color][sq]:
+                score -= sign * BACKWARD_PAWN_PENALTY
+            if not enemy & PASSED_PAWN_MASKS[color][sq]:
+                score += sign * PASSED_PAWN_BONUS[6 - r if color == 'w' else r - 1]
     return score
 
 def findRandomMove(validMoves):
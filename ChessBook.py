@@ -0,0 +1,244 @@
+import argparse
+import mmap
+import random
+import re
+import struct
+import sys
+
+from ChessEngine import GameState, Move, PROMOTION_PIECES
+
+# A book is a file of 16-byte Polyglot entries (key, move, weight, learn), big-endian and sorted by key.
+# Keys are GameState.zobrist, which follows the Polyglot layout.
+BOOK_ENTRY = struct.Struct('>QHHI')
+BOOK_KEY = struct.Struct('>Q')
+# Promotion field of a Polyglot move: 0 for none, then knight, bishop, rook, queen
+POLYGLOT_PROMOTIONS = ' NBRQ'
+BOOK_PLIES = 20
+MAX_WEIGHT = 0xFFFF
+
+PGN_TOKENS = re.compile(r'\[\s*(\w+)\s+"([^"]*)"\s*\]|\{[^}]*\}|;[^\n]*|\(|\)|\$\d+|1-0|0-1|1/2-1/2|\*|\d+\.+|'
+                        r'[^\s()\[\]{};]+')
+GAME_RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+
+def encodeMove(move):
+    """Polyglot code of a move: to file and rank, from file and rank, promotion piece, three bits each.
+    Castling is written as the king taking its own rook."""
+    toCol = move.endCol
+    if move.isCastleMove:
+        toCol = 7 if move.endCol == 6 else 0
+    promotion = POLYGLOT_PROMOTIONS.index(move.promotionChoice) if move.isPawnPromotion else 0
+    return toCol | (7 - move.endRow) << 3 | move.startCol << 6 | (7 - move.startRow) << 9 | promotion << 12
+
+
+def decodeMove(code, validMoves):
+    """The legal move for a Polyglot move code, or None if it is not legal here"""
+    startSq = (7 - ((code >> 9) & 7)) * 8 + ((code >> 6) & 7)
+    endSq = (7 - ((code >> 3) & 7)) * 8 + (code & 7)
+    promotion = (code >> 12) & 7
+    for move in validMoves:
+        if move.code & 63 != startSq:
+            continue
+        moveEnd = (move.code >> 6) & 63
+        if move.isCastleMove:
+            # The book moves the king onto the rook's square
+            moveEnd = (moveEnd & 56) | (7 if moveEnd & 7 == 6 else 0)
+        if moveEnd == endSq:
+            if move.isPawnPromotion:
+                return move.withPromotion(POLYGLOT_PROMOTIONS[promotion] if promotion else 'Q')
+            return move
+    return None
+
+
+class OpeningBook:
+    """Read-only Polyglot book, memory-mapped so that opening it costs nothing and lookups touch only the pages
+    a binary search visits"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.file.seek(0, 2)
+        self.size = self.file.tell() // BOOK_ENTRY.size
+        # mmap refuses empty files, and an empty book simply never has a move
+        self.memory = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        if self.memory is not None:
+            self.memory.close()
+            self.memory = None
+        self.file.close()
+
+    def firstIndex(self, key):
+        """Index of the first entry whose key is not below key"""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) >> 1
+            if BOOK_KEY.unpack_from(self.memory, middle * BOOK_ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, key):
+        """(Polyglot move code, weight) of every entry for key"""
+        results = []
+        i = self.firstIndex(key) if self.size else 0
+        while i < self.size:
+            entryKey, code, weight, _ = BOOK_ENTRY.unpack_from(self.memory, i * BOOK_ENTRY.size)
+            if entryKey != key:
+                break
+            results.append((code, weight))
+            i += 1
+        return results
+
+    def findMoves(self, gs, validMoves):
+        """(legal move, weight) pairs the book gives for the position, heaviest first"""
+        moves = []
+        for code, weight in self.entries(gs.zobrist):
+            move = decodeMove(code, validMoves)
+            if move is not None and weight > 0:
+                moves.append((move, weight))
+        moves.sort(key=lambda pair: -pair[1])
+        return moves
+
+    def pickMove(self, gs, validMoves):
+        """A book move chosen at random in proportion to its weight, or None when the position is out of book"""
+        moves = self.findMoves(gs, validMoves)
+        if not moves:
+            return None
+        return random.choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+
+
+def parseSAN(gs, san, validMoves):
+    """The legal move written in standard algebraic notation (e4, Nbd7, exd8=Q+, O-O), or None"""
+    san = san.rstrip('+#!?')
+    if san.endswith('e.p.'):
+        san = san[:-4]
+    if san.replace('0', 'O') in ('O-O', 'O-O-O'):
+        endCol = 6 if san.replace('0', 'O') == 'O-O' else 2
+        for move in validMoves:
+            if move.isCastleMove and move.endCol == endCol:
+                return move
+        return None
+    promotion = None
+    if '=' in san:
+        san, promotion = san.split('=', 1)
+        promotion = promotion[:1].upper()
+    elif len(san) > 2 and san[-1] in 'QRBN' and san[0] in 'abcdefgh':
+        san, promotion = san[:-1], san[-1]
+    if len(san) < 2 or san[-2] not in Move.filesToCols or san[-1] not in Move.ranksToRows:
+        return None
+    piece = san[0] if san[0] in 'NBRQK' else 'p'
+    endRow, endCol = Move.ranksToRows[san[-1]], Move.filesToCols[san[-2]]
+    hint = san[1 if piece != 'p' else 0:-2].replace('x', '').replace('-', '')
+    found = None
+    for move in validMoves:
+        if move.pieceMoved[1] != piece or move.endRow != endRow or move.endCol != endCol:
+            continue
+        if any((c in Move.filesToCols and Move.filesToCols[c] != move.startCol) or
+               (c in Move.ranksToRows and Move.ranksToRows[c] != move.startRow) for c in hint):
+            continue
+        if found is not None:
+            # Ambiguous without more of the from square
+            return None
+        found = move
+    if found is not None and found.isPawnPromotion:
+        found = found.withPromotion(promotion if promotion in PROMOTION_PIECES else 'Q')
+    return found
+
+
+def readPGN(text):
+    """(tags, SAN moves) of each game in PGN text, leaving out comments, variations, NAGs and move numbers"""
+    tags = {}
+    moves = []
+    variationDepth = 0
+    for match in PGN_TOKENS.finditer(text):
+        token = match.group(0)
+        if match.group(1):
+            if moves:
+                yield tags, moves
+                tags, moves = {}, []
+            tags[match.group(1)] = match.group(2)
+        elif token == '(':
+            variationDepth += 1
+        elif token == ')':
+            variationDepth = max(variationDepth - 1, 0)
+        elif variationDepth or token[0] in '{;$' or token[0].isdigit() and token.endswith('.'):
+            continue
+        elif token in GAME_RESULTS:
+            tags.setdefault('Result', token)
+            yield tags, moves
+            tags, moves = {}, []
+        else:
+            moves.append(token)
+    if moves:
+        yield tags, moves
+
+
+def buildBook(pgnPaths, outPath, plies=BOOK_PLIES, minGames=1):
+    """Write a book of the first plies moves of every game in the PGN files. A move's weight is 2 per game its side
+    won and 1 per draw or unknown result; moves played in fewer than minGames games, or only in lost games, are
+    left out. Returns (games read, games with an unreadable move, entries written)."""
+    counts = {}
+    games = skipped = 0
+    for path in pgnPaths:
+        with open(path, encoding='utf-8', errors='replace') as pgnFile:
+            text = pgnFile.read()
+        for tags, sanMoves in readPGN(text):
+            games += 1
+            result = tags.get('Result', '*')
+            gs = GameState.fromFEN(tags['FEN']) if 'FEN' in tags else GameState()
+            for san in sanMoves[:plies]:
+                move = parseSAN(gs, san, gs.getValidMoves())
+                if move is None:
+                    skipped += 1
+                    break
+                if result == '1/2-1/2' or result == '*':
+                    score = 1
+                else:
+                    score = 2 if (result == '1-0') == gs.whiteToMove else 0
+                entry = counts.setdefault((gs.zobrist, encodeMove(move)), [0, 0])
+                entry[0] += score
+                entry[1] += 1
+                gs.makeMove(move)
+
+    entries = [(key, code, score) for (key, code), (score, played) in counts.items() if played >= minGames and score]
+    top = max((score for _, _, score in entries), default=0)
+    scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1
+    entries.sort(key=lambda entry: (entry[0], -entry[2]))
+    with open(outPath, 'wb') as bookFile:
+        for key, code, score in entries:
+            bookFile.write(BOOK_ENTRY.pack(key, code, max(1, int(score * scale)), 0))
+    return games, skipped, len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a Polyglot-format opening book from PGN files, or look up "
+                                                 "a position in one.")
+    parser.add_argument("pgn", nargs="*", help="PGN files to build the book from")
+    parser.add_argument("-o", "--output", default="book.bin", help="book file to write (default: book.bin)")
+    parser.add_argument("--plies", type=int, default=BOOK_PLIES,
+                        help="moves per game to put in the book (default: %d)" % BOOK_PLIES)
+    parser.add_argument("--min-games", type=int, default=1, help="games a move must be played in (default: 1)")
+    parser.add_argument("--probe", metavar="FEN", help="print the book moves for a position instead of building")
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        book = OpeningBook(args.output)
+        gs = GameState.fromFEN(args.probe)
+        for move, weight in book.findMoves(gs, gs.getValidMoves()):
+            print(f"{move.getChessNotation()}  {weight}")
+        book.close()
+        return 0
+    if not args.pgn:
+        parser.error("give PGN files to build from, or --probe FEN")
+    games, skipped, entries = buildBook(args.pgn, args.output, args.plies, args.min_games)
+    print(f"{games} games, {skipped} stopped at an unreadable move, {entries} entries written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,386 @@
+from ChessEval import PIECE_SQUARE_SCORES, unpackScore
+
+# Squares are numbered row * 8 + col, so a8 is 0 and h1 is 63, matching board[row][col].
+SQUARE_BITS = [1 << sq for sq in range(64)]
+PIECES = ('wp', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bp', 'bN', 'bB', 'bR', 'bQ', 'bK')
+PROMOTION_RANKS = 0xFF | 0xFF << 56
+
+# A move packs into one int: from square (bits 0-5), to square (6-11), en passant/castle/promotion
+# flags (12-14), promotion piece (15-16), captured piece (17-20) and moved piece (21-24).
+MOVE_SQUARES = 0xFFF
+MOVE_ENPASSANT = 1 << 12
+MOVE_CASTLE = 1 << 13
+MOVE_PROMOTION = 1 << 14
+PROMOTION_SHIFT = 15
+CAPTURED_SHIFT = 17
+MOVED_SHIFT = 21
+PROMOTION_PIECES = 'QRBN'
+PIECE_NAMES = ('--',) + PIECES
+CAPTURED_BITS = {piece: i << CAPTURED_SHIFT for i, piece in enumerate(PIECE_NAMES)}
+MOVED_BITS = {piece: i << MOVED_SHIFT for i, piece in enumerate(PIECE_NAMES)}
+# Capture ordering (most valuable victim, least valuable attacker), indexed like PIECE_NAMES
+MVV_LVA_RANKS = (0,) + (1, 2, 3, 4, 5, 6) * 2
+# Piece values for static exchange evaluation, in pawns
+SEE_VALUES = {'p': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 100}
+SEE_ORDER = 'pNBRQK'
+
+# Castling rights are a 4-bit mask; moving from or to a square keeps only the rights listed for it.
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+ALL_CASTLING = 15
+CASTLING_KEPT = [ALL_CASTLING] * 64
+CASTLING_KEPT[60] = BLACK_KINGSIDE | BLACK_QUEENSIDE
+CASTLING_KEPT[63] = ALL_CASTLING ^ WHITE_KINGSIDE
+CASTLING_KEPT[56] = ALL_CASTLING ^ WHITE_QUEENSIDE
+CASTLING_KEPT[4] = WHITE_KINGSIDE | WHITE_QUEENSIDE
+CASTLING_KEPT[7] = ALL_CASTLING ^ BLACK_KINGSIDE
+CASTLING_KEPT[0] = ALL_CASTLING ^ BLACK_QUEENSIDE
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+CASTLING_FLAGS = (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE), ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE))
+# Home squares of the castling kings and rooks, with the piece each must hold for its rights to stand
+CASTLING_HOMES = ((60, 'wK'), (63, 'wR'), (56, 'wR'), (4, 'bK'), (7, 'bR'), (0, 'bR'))
+
+# Undo history is one flat list with a fixed stride per ply, grown a block at a time.
+HISTORY_STRIDE = 5
+HISTORY_BLOCK = 512
+
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+# The first four directions walk towards higher square indices, the last four towards lower ones.
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1), (-1, 0), (0, -1), (-1, -1), (-1, 1))
+ROOK_DIRECTIONS = (0, 1, 4, 5)
+BISHOP_DIRECTIONS = (2, 3, 6, 7)
+
+
+def _buildStepAttacks(offsets):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        bb = 0
+        for dr, dc in offsets:
+            if 0 <= r + dr < 8 and 0 <= c + dc < 8:
+                bb |= SQUARE_BITS[(r + dr) * 8 + c + dc]
+        table.append(bb)
+    return table
+
+
+def _buildRays():
+    rays = []
+    for dr, dc in DIRECTIONS:
+        table = []
+        for sq in range(64):
+            r, c = divmod(sq, 8)
+            bb = 0
+            r, c = r + dr, c + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                bb |= SQUARE_BITS[r * 8 + c]
+                r, c = r + dr, c + dc
+            table.append(bb)
+        rays.append(table)
+    return rays
+
+
+def _buildSliderMasks(directions):
+    # The last square of each ray never changes the attack set, so it is left out of the lookup key.
+    masks = []
+    for sq in range(64):
+        mask = 0
+        for d in directions:
+            ray = RAYS[d][sq]
+            if ray:
+                edge = (ray & -ray) if d >= 4 else SQUARE_BITS[ray.bit_length() - 1]
+                mask |= ray ^ edge
+        masks.append(mask)
+    return masks
+
+
+def _buildLines():
+    # between[a][b] holds the squares strictly between two aligned squares, line[a][b] the whole line through them.
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for d, (dr, dc) in enumerate(DIRECTIONS):
+        for sq in range(64):
+            fullLine = RAYS[d][sq] | RAYS[d ^ 4][sq] | SQUARE_BITS[sq]
+            path = 0
+            r, c = divmod(sq, 8)
+            r, c = r + dr, c + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                target = r * 8 + c
+                between[sq][target] = path
+                line[sq][target] = fullLine
+                path |= SQUARE_BITS[target]
+                r, c = r + dr, c + dc
+    return between, line
+
+
+def _slidingAttacks(sq, occupied, directions):
+    attacks = 0
+    for d in directions:
+        ray = RAYS[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            blocker = (blockers & -blockers).bit_length() - 1 if d < 4 else blockers.bit_length() - 1
+            ray ^= RAYS[d][blocker]
+        attacks |= ray
+    return attacks
+
+
+KNIGHT_ATTACKS = _buildStepAttacks(KNIGHT_OFFSETS)
+KING_ATTACKS = _buildStepAttacks(KING_OFFSETS)
+PAWN_ATTACKS = {'w': _buildStepAttacks(((-1, -1), (-1, 1))), 'b': _buildStepAttacks(((1, -1), (1, 1)))}
+RAYS = _buildRays()
+ROOK_MASKS = _buildSliderMasks(ROOK_DIRECTIONS)
+BISHOP_MASKS = _buildSliderMasks(BISHOP_DIRECTIONS)
+BETWEEN, LINE = _buildLines()
+ROOK_RAYS = [_slidingAttacks(sq, 0, ROOK_DIRECTIONS) for sq in range(64)]
+BISHOP_RAYS = [_slidingAttacks(sq, 0, BISHOP_DIRECTIONS) for sq in range(64)]
+ALL_SQUARES = (1 << 64) - 1
+
+# Zobrist keys are Polyglot's: its Random64 table of 768 piece-square keys, then castling, en passant file and side
+# to move, so positions hash to the same keys as in books made by other Polyglot tools.
+ZOBRIST_RANDOMS = [
+    0x9D39247E33776D41, 0x2AF7398005AAA5C7, 0x44DB015024623547, 0x9C15F73E62A76AE2,
+    0x75834465489C0C89, 0x3290AC3A203001BF, 0x0FBBAD1F61042279, 0xE83A908FF2FB60CA,
+    0x0D7E765D58755C10, 0x1A083822CEAFE02D, 0x9605D5F0E25EC3B0, 0xD021FF5CD13A2ED5,
+    0x40BDF15D4A672E32, 0x011355146FD56395, 0x5DB4832046F3D9E5, 0x239F8B2D7FF719CC,
+    0x05D1A1AE85B49AA1, 0x679F848F6E8FC971, 0x7449BBFF801FED0B, 0x7D11CDB1C3B7ADF0,
+    0x82C7709E781EB7CC, 0xF3218F1C9510786C, 0x331478F3AF51BBE6, 0x4BB38DE5E7219443,
+    0xAA649C6EBCFD50FC, 0x8DBD98A352AFD40B, 0x87D2074B81D79217, 0x19F3C751D3E92AE1,
+    0xB4AB30F062B19ABF, 0x7B0500AC42047AC4, 0xC9452CA81A09D85D, 0x24AA6C514DA27500,
+    0x4C9F34427501B447, 0x14A68FD73C910841, 0xA71B9B83461CBD93, 0x03488B95B0F1850F,
+    0x637B2B34FF93C040, 0x09D1BC9A3DD90A94, 0x3575668334A1DD3B, 0x735E2B97A4C45A23,
+    0x18727070F1BD400B, 0x1FCBACD259BF02E7, 0xD310A7C2CE9B6555, 0xBF983FE0FE5D8244,
+    0x9F74D14F7454A824, 0x51EBDC4AB9BA3035, 0x5C82C505DB9AB0FA, 0xFCF7FE8A3430B241,
+    0x3253A729B9BA3DDE, 0x8C74C368081B3075, 0xB9BC6C87167C33E7, 0x7EF48F2B83024E20,
+    0x11D505D4C351BD7F, 0x6568FCA92C76A243, 0x4DE0B0F40F32A7B8, 0x96D693460CC37E5D,
+    0x42E240CB63689F2F, 0x6D2BDCDAE2919661, 0x42880B0236E4D951, 0x5F0F4A5898171BB6,
+    0x39F890F579F92F88, 0x93C5B5F47356388B, 0x63DC359D8D231B78, 0xEC16CA8AEA98AD76,
+    0x5355F900C2A82DC7, 0x07FB9F855A997142, 0x5093417AA8A7ED5E, 0x7BCBC38DA25A7F3C,
+    0x19FC8A768CF4B6D4, 0x637A7780DECFC0D9, 0x8249A47AEE0E41F7, 0x79AD695501E7D1E8,
+    0x14ACBAF4777D5776, 0xF145B6BECCDEA195, 0xDABF2AC8201752FC, 0x24C3C94DF9C8D3F6,
+    0xBB6E2924F03912EA, 0x0CE26C0B95C980D9, 0xA49CD132BFBF7CC4, 0xE99D662AF4243939,
+    0x27E6AD7891165C3F, 0x8535F040B9744FF1, 0x54B3F4FA5F40D873, 0x72B12C32127FED2B,
+    0xEE954D3C7B411F47, 0x9A85AC909A24EAA1, 0x70AC4CD9F04F21F5, 0xF9B89D3E99A075C2,
+    0x87B3E2B2B5C907B1, 0xA366E5B8C54F48B8, 0xAE4A9346CC3F7CF2, 0x1920C04D47267BBD,
+    0x87BF02C6B49E2AE9, 0x092237AC237F3859, 0xFF07F64EF8ED14D0, 0x8DE8DCA9F03CC54E,
+    0x9C1633264DB49C89, 0xB3F22C3D0B0B38ED, 0x390E5FB44D01144B, 0x5BFEA5B4712768E9,
+    0x1E1032911FA78984, 0x9A74ACB964E78CB3, 0x4F80F7A035DAFB04, 0x6304D09A0B3738C4,
+    0x2171E64683023A08, 0x5B9B63EB9CEFF80C, 0x506AACF489889342, 0x1881AFC9A3A701D6,
+    0x6503080440750644, 0xDFD395339CDBF4A7, 0xEF927DBCF00C20F2, 0x7B32F7D1E03680EC,
+    0xB9FD7620E7316243, 0x05A7E8A57DB91B77, 0xB5889C6E15630A75, 0x4A750A09CE9573F7,
+    0xCF464CEC899A2F8A, 0xF538639CE705B824, 0x3C79A0FF5580EF7F, 0xEDE6C87F8477609D,
+    0x799E81F05BC93F31, 0x86536B8CF3428A8C, 0x97D7374C60087B73, 0xA246637CFF328532,
+    0x043FCAE60CC0EBA0, 0x920E449535DD359E, 0x70EB093B15B290CC, 0x73A1921916591CBD,
+    0x56436C9FE1A1AA8D, 0xEFAC4B70633B8F81, 0xBB215798D45DF7AF, 0x45F20042F24F1768,
+    0x930F80F4E8EB7462, 0xFF6712FFCFD75EA1, 0xAE623FD67468AA70, 0xDD2C5BC84BC8D8FC,
+    0x7EED120D54CF2DD9, 0x22FE545401165F1C, 0xC91800E98FB99929, 0x808BD68E6AC10365,
+    0xDEC468145B7605F6, 0x1BEDE3A3AEF53302, 0x43539603D6C55602, 0xAA969B5C691CCB7A,
+    0xA87832D392EFEE56, 0x65942C7B3C7E11AE, 0xDED2D633CAD004F6, 0x21F08570F420E565,
+    0xB415938D7DA94E3C, 0x91B859E59ECB6350, 0x10CFF333E0ED804A, 0x28AED140BE0BB7DD,
+    0xC5CC1D89724FA456, 0x5648F680F11A2741, 0x2D255069F0B7DAB3, 0x9BC5A38EF729ABD4,
+    0xEF2F054308F6A2BC, 0xAF2042F5CC5C2858, 0x480412BAB7F5BE2A, 0xAEF3AF4A563DFE43,
+    0x19AFE59AE451497F, 0x52593803DFF1E840, 0xF4F076E65F2CE6F0, 0x11379625747D5AF3,
+    0xBCE5D2248682C115, 0x9DA4243DE836994F, 0x066F70B33FE09017, 0x4DC4DE189B671A1C,
+    0x51039AB7712457C3, 0xC07A3F80C31FB4B4, 0xB46EE9C5E64A6E7C, 0xB3819A42ABE61C87,
+    0x21A007933A522A20, 0x2DF16F761598AA4F, 0x763C4A1371B368FD, 0xF793C46702E086A0,
+    0xD7288E012AEB8D31, 0xDE336A2A4BC1C44B, 0x0BF692B38D079F23, 0x2C604A7A177326B3,
+    0x4850E73E03EB6064, 0xCFC447F1E53C8E1B, 0xB05CA3F564268D99, 0x9AE182C8BC9474E8,
+    0xA4FC4BD4FC5558CA, 0xE755178D58FC4E76, 0x69B97DB1A4C03DFE, 0xF9B5B7C4ACC67C96,
+    0xFC6A82D64B8655FB, 0x9C684CB6C4D24417, 0x8EC97D2917456ED0, 0x6703DF9D2924E97E,
+    0xC547F57E42A7444E, 0x78E37644E7CAD29E, 0xFE9A44E9362F05FA, 0x08BD35CC38336615,
+    0x9315E5EB3A129ACE, 0x94061B871E04DF75, 0xDF1D9F9D784BA010, 0x3BBA57B68871B59D,
+    0xD2B7ADEEDED1F73F, 0xF7A255D83BC373F8, 0xD7F4F2448C0CEB81, 0xD95BE88CD210FFA7,
+    0x336F52F8FF4728E7, 0xA74049DAC312AC71, 0xA2F61BB6E437FDB5, 0x4F2A5CB07F6A35B3,
+    0x87D380BDA5BF7859, 0x16B9F7E06C453A21, 0x7BA2484C8A0FD54E, 0xF3A678CAD9A2E38C,
+    0x39B0BF7DDE437BA2, 0xFCAF55C1BF8A4424, 0x18FCF680573FA594, 0x4C0563B89F495AC3,
+    0x40E087931A00930D, 0x8CFFA9412EB642C1, 0x68CA39053261169F, 0x7A1EE967D27579E2,
+    0x9D1D60E5076F5B6F, 0x3810E399B6F65BA2, 0x32095B6D4AB5F9B1, 0x35CAB62109DD038A,
+    0xA90B24499FCFAFB1, 0x77A225A07CC2C6BD, 0x513E5E634C70E331, 0x4361C0CA3F692F12,
+    0xD941ACA44B20A45B, 0x528F7C8602C5807B, 0x52AB92BEB9613989, 0x9D1DFA2EFC557F73,
+    0x722FF175F572C348, 0x1D1260A51107FE97, 0x7A249A57EC0C9BA2, 0x04208FE9E8F7F2D6,
+    0x5A110C6058B920A0, 0x0CD9A497658A5698, 0x56FD23C8F9715A4C, 0x284C847B9D887AAE,
+    0x04FEABFBBDB619CB, 0x742E1E651C60BA83, 0x9A9632E65904AD3C, 0x881B82A13B51B9E2,
+    0x506E6744CD974924, 0xB0183DB56FFC6A79, 0x0ED9B915C66ED37E, 0x5E11E86D5873D484,
+    0xF678647E3519AC6E, 0x1B85D488D0F20CC5, 0xDAB9FE6525D89021, 0x0D151D86ADB73615,
+    0xA865A54EDCC0F019, 0x93C42566AEF98FFB, 0x99E7AFEABE000731, 0x48CBFF086DDF285A,
+    0x7F9B6AF1EBF78BAF, 0x58627E1A149BBA21, 0x2CD16E2ABD791E33, 0xD363EFF5F0977996,
+    0x0CE2A38C344A6EED, 0x1A804AADB9CFA741, 0x907F30421D78C5DE, 0x501F65EDB3034D07,
+    0x37624AE5A48FA6E9, 0x957BAF61700CFF4E, 0x3A6C27934E31188A, 0xD49503536ABCA345,
+    0x088E049589C432E0, 0xF943AEE7FEBF21B8, 0x6C3B8E3E336139D3, 0x364F6FFA464EE52E,
+    0xD60F6DCEDC314222, 0x56963B0DCA418FC0, 0x16F50EDF91E513AF, 0xEF1955914B609F93,
+    0x565601C0364E3228, 0xECB53939887E8175, 0xBAC7A9A18531294B, 0xB344C470397BBA52,
+    0x65D34954DAF3CEBD, 0xB4B81B3FA97511E2, 0xB422061193D6F6A7, 0x071582401C38434D,
+    0x7A13F18BBEDC4FF5, 0xBC4097B116C524D2, 0x59B97885E2F2EA28, 0x99170A5DC3115544,
+    0x6F423357E7C6A9F9, 0x325928EE6E6F8794, 0xD0E4366228B03343, 0x565C31F7DE89EA27,
+    0x30F5611484119414, 0xD873DB391292ED4F, 0x7BD94E1D8E17DEBC, 0xC7D9F16864A76E94,
+    0x947AE053EE56E63C, 0xC8C93882F9475F5F, 0x3A9BF55BA91F81CA, 0xD9A11FBB3D9808E4,
+    0x0FD22063EDC29FCA, 0xB3F256D8ACA0B0B9, 0xB03031A8B4516E84, 0x35DD37D5871448AF,
+    0xE9F6082B05542E4E, 0xEBFAFA33D7254B59, 0x9255ABB50D532280, 0xB9AB4CE57F2D34F3,
+    0x693501D628297551, 0xC62C58F97DD949BF, 0xCD454F8F19C5126A, 0xBBE83F4ECC2BDECB,
+    0xDC842B7E2819E230, 0xBA89142E007503B8, 0xA3BC941D0A5061CB, 0xE9F6760E32CD8021,
+    0x09C7E552BC76492F, 0x852F54934DA55CC9, 0x8107FCCF064FCF56, 0x098954D51FFF6580,
+    0x23B70EDB1955C4BF, 0xC330DE426430F69D, 0x4715ED43E8A45C0A, 0xA8D7E4DAB780A08D,
+    0x0572B974F03CE0BB, 0xB57D2E985E1419C7, 0xE8D9ECBE2CF3D73F, 0x2FE4B17170E59750,
+    0x11317BA87905E790, 0x7FBF21EC8A1F45EC, 0x1725CABFCB045B00, 0x964E915CD5E2B207,
+    0x3E2B8BCBF016D66D, 0xBE7444E39328A0AC, 0xF85B2B4FBCDE44B7, 0x49353FEA39BA63B1,
+    0x1DD01AAFCD53486A, 0x1FCA8A92FD719F85, 0xFC7C95D827357AFA, 0x18A6A990C8B35EBD,
+    0xCCCB7005C6B9C28D, 0x3BDBB92C43B17F26, 0xAA70B5B4F89695A2, 0xE94C39A54A98307F,
+    0xB7A0B174CFF6F36E, 0xD4DBA84729AF48AD, 0x2E18BC1AD9704A68, 0x2DE0966DAF2F8B1C,
+    0xB9C11D5B1E43A07E, 0x64972D68DEE33360, 0x94628D38D0C20584, 0xDBC0D2B6AB90A559,
+    0xD2733C4335C6A72F, 0x7E75D99D94A70F4D, 0x6CED1983376FA72B, 0x97FCAACBF030BC24,
+    0x7B77497B32503B12, 0x8547EDDFB81CCB94, 0x79999CDFF70902CB, 0xCFFE1939438E9B24,
+    0x829626E3892D95D7, 0x92FAE24291F2B3F1, 0x63E22C147B9C3403, 0xC678B6D860284A1C,
+    0x5873888850659AE7, 0x0981DCD296A8736D, 0x9F65789A6509A440, 0x9FF38FED72E9052F,
+    0xE479EE5B9930578C, 0xE7F28ECD2D49EECD, 0x56C074A581EA17FE, 0x5544F7D774B14AEF,
+    0x7B3F0195FC6F290F, 0x12153635B2C0CF57, 0x7F5126DBBA5E0CA7, 0x7A76956C3EAFB413,
+    0x3D5774A11D31AB39, 0x8A1B083821F40CB4, 0x7B4A38E32537DF62, 0x950113646D1D6E03,
+    0x4DA8979A0041E8A9, 0x3BC36E078F7515D7, 0x5D0A12F27AD310D1, 0x7F9D1A2E1EBE1327,
+    0xDA3A361B1C5157B1, 0xDCDD7D20903D0C25, 0x36833336D068F707, 0xCE68341F79893389,
+    0xAB9090168DD05F34, 0x43954B3252DC25E5, 0xB438C2B67F98E5E9, 0x10DCD78E3851A492,
+    0xDBC27AB5447822BF, 0x9B3CDB65F82CA382, 0xB67B7896167B4C84, 0xBFCED1B0048EAC50,
+    0xA9119B60369FFEBD, 0x1FFF7AC80904BF45, 0xAC12FB171817EEE7, 0xAF08DA9177DDA93D,
+    0x1B0CAB936E65C744, 0xB559EB1D04E5E932, 0xC37B45B3F8D6F2BA, 0xC3A9DC228CAAC9E9,
+    0xF3B8B6675A6507FF, 0x9FC477DE4ED681DA, 0x67378D8ECCEF96CB, 0x6DD856D94D259236,
+    0xA319CE15B0B4DB31, 0x073973751F12DD5E, 0x8A8E849EB32781A5, 0xE1925C71285279F5,
+    0x74C04BF1790C0EFE, 0x4DDA48153C94938A, 0x9D266D6A1CC0542C, 0x7440FB816508C4FE,
+    0x13328503DF48229F, 0xD6BF7BAEE43CAC40, 0x4838D65F6EF6748F, 0x1E152328F3318DEA,
+    0x8F8419A348F296BF, 0x72C8834A5957B511, 0xD7A023A73260B45C, 0x94EBC8ABCFB56DAE,
+    0x9FC10D0F989993E0, 0xDE68A2355B93CAE6, 0xA44CFE79AE538BBE, 0x9D1D84FCCE371425,
+    0x51D2B1AB2DDFB636, 0x2FD7E4B9E72CD38C, 0x65CA5B96B7552210, 0xDD69A0D8AB3B546D,
+    0x604D51B25FBF70E2, 0x73AA8A564FB7AC9E, 0x1A8C1E992B941148, 0xAAC40A2703D9BEA0,
+    0x764DBEAE7FA4F3A6, 0x1E99B96E70A9BE8B, 0x2C5E9DEB57EF4743, 0x3A938FEE32D29981,
+    0x26E6DB8FFDF5ADFE, 0x469356C504EC9F9D, 0xC8763C5B08D1908C, 0x3F6C6AF859D80055,
+    0x7F7CC39420A3A545, 0x9BFB227EBDF4C5CE, 0x89039D79D6FC5C5C, 0x8FE88B57305E2AB6,
+    0xA09E8C8C35AB96DE, 0xFA7E393983325753, 0xD6B6D0ECC617C699, 0xDFEA21EA9E7557E3,
+    0xB67C1FA481680AF8, 0xCA1E3785A9E724E5, 0x1CFC8BED0D681639, 0xD18D8549D140CAEA,
+    0x4ED0FE7E9DC91335, 0xE4DBF0634473F5D2, 0x1761F93A44D5AEFE, 0x53898E4C3910DA55,
+    0x734DE8181F6EC39A, 0x2680B122BAA28D97, 0x298AF231C85BAFAB, 0x7983EED3740847D5,
+    0x66C1A2A1A60CD889, 0x9E17E49642A3E4C1, 0xEDB454E7BADC0805, 0x50B704CAB602C329,
+    0x4CC317FB9CDDD023, 0x66B4835D9EAFEA22, 0x219B97E26FFC81BD, 0x261E4E4C0A333A9D,
+    0x1FE2CCA76517DB90, 0xD7504DFA8816EDBB, 0xB9571FA04DC089C8, 0x1DDC0325259B27DE,
+    0xCF3F4688801EB9AA, 0xF4F5D05C10CAB243, 0x38B6525C21A42B0E, 0x36F60E2BA4FA6800,
+    0xEB3593803173E0CE, 0x9C4CD6257C5A3603, 0xAF0C317D32ADAA8A, 0x258E5A80C7204C4B,
+    0x8B889D624D44885D, 0xF4D14597E660F855, 0xD4347F66EC8941C3, 0xE699ED85B0DFB40D,
+    0x2472F6207C2D0484, 0xC2A1E7B5B459AEB5, 0xAB4F6451CC1D45EC, 0x63767572AE3D6174,
+    0xA59E0BD101731A28, 0x116D0016CB948F09, 0x2CF9C8CA052F6E9F, 0x0B090A7560A968E3,
+    0xABEEDDB2DDE06FF1, 0x58EFC10B06A2068D, 0xC6E57A78FBD986E0, 0x2EAB8CA63CE802D7,
+    0x14A195640116F336, 0x7C0828DD624EC390, 0xD74BBE77E6116AC7, 0x804456AF10F5FB53,
+    0xEBE9EA2ADF4321C7, 0x03219A39EE587A30, 0x49787FEF17AF9924, 0xA1E9300CD8520548,
+    0x5B45E522E4B1B4EF, 0xB49C3B3995091A36, 0xD4490AD526F14431, 0x12A8F216AF9418C2,
+    0x001F837CC7350524, 0x1877B51E57A764D5, 0xA2853B80F17F58EE, 0x993E1DE72D36D310,
+    0xB3598080CE64A656, 0x252F59CF0D9F04BB, 0xD23C8E176D113600, 0x1BDA0492E7E4586E,
+    0x21E0BD5026C619BF, 0x3B097ADAF088F94E, 0x8D14DEDB30BE846E, 0xF95CFFA23AF5F6F4,
+    0x3871700761B3F743, 0xCA672B91E9E4FA16, 0x64C8E531BFF53B55, 0x241260ED4AD1E87D,
+    0x106C09B972D2E822, 0x7FBA195410E5CA30, 0x7884D9BC6CB569D8, 0x0647DFEDCD894A29,
+    0x63573FF03E224774, 0x4FC8E9560F91B123, 0x1DB956E450275779, 0xB8D91274B9E9D4FB,
+    0xA2EBEE47E2FBFCE1, 0xD9F1F30CCD97FB09, 0xEFED53D75FD64E6B, 0x2E6D02C36017F67F,
+    0xA9AA4D20DB084E9B, 0xB64BE8D8B25396C1, 0x70CB6AF7C2D5BCF0, 0x98F076A4F7A2322E,
+    0xBF84470805E69B5F, 0x94C3251F06F90CF3, 0x3E003E616A6591E9, 0xB925A6CD0421AFF3,
+    0x61BDD1307C66E300, 0xBF8D5108E27E0D48, 0x240AB57A8B888B20, 0xFC87614BAF287E07,
+    0xEF02CDD06FFDB432, 0xA1082C0466DF6C0A, 0x8215E577001332C8, 0xD39BB9C3A48DB6CF,
+    0x2738259634305C14, 0x61CF4F94C97DF93D, 0x1B6BACA2AE4E125B, 0x758F450C88572E0B,
+    0x959F587D507A8359, 0xB063E962E045F54D, 0x60E8ED72C0DFF5D1, 0x7B64978555326F9F,
+    0xFD080D236DA814BA, 0x8C90FD9B083F4558, 0x106F72FE81E2C590, 0x7976033A39F7D952,
+    0xA4EC0132764CA04B, 0x733EA705FAE4FA77, 0xB4D8F77BC3E56167, 0x9E21F4F903B33FD9,
+    0x9D765E419FB69F6D, 0xD30C088BA61EA5EF, 0x5D94337FBFAF7F5B, 0x1A4E4822EB4D7A59,
+    0x6FFE73E81B637FB3, 0xDDF957BC36D8B9CA, 0x64D0E29EEA8838B3, 0x08DD9BDFD96B9F63,
+    0x087E79E5A57D1D13, 0xE328E230E3E2B3FB, 0x1C2559E30F0946BE, 0x720BF5F26F4D2EAA,
+    0xB0774D261CC609DB, 0x443F64EC5A371195, 0x4112CF68649A260E, 0xD813F2FAB7F5C5CA,
+    0x660D3257380841EE, 0x59AC2C7873F910A3, 0xE846963877671A17, 0x93B633ABFA3469F8,
+    0xC0C0F5A60EF4CDCF, 0xCAF21ECD4377B28C, 0x57277707199B8175, 0x506C11B9D90E8B1D,
+    0xD83CC2687A19255F, 0x4A29C6465A314CD1, 0xED2DF21216235097, 0xB5635C95FF7296E2,
+    0x22AF003AB672E811, 0x52E762596BF68235, 0x9AEBA33AC6ECC6B0, 0x944F6DE09134DFB6,
+    0x6C47BEC883A7DE39, 0x6AD047C430A12104, 0xA5B1CFDBA0AB4067, 0x7C45D833AFF07862,
+    0x5092EF950A16DA0B, 0x9338E69C052B8E7B, 0x455A4B4CFE30E3F5, 0x6B02E63195AD0CF8,
+    0x6B17B224BAD6BF27, 0xD1E0CCD25BB9C169, 0xDE0C89A556B9AE70, 0x50065E535A213CF6,
+    0x9C1169FA2777B874, 0x78EDEFD694AF1EED, 0x6DC93D9526A50E68, 0xEE97F453F06791ED,
+    0x32AB0EDB696703D3, 0x3A6853C7E70757A7, 0x31865CED6120F37D, 0x67FEF95D92607890,
+    0x1F2B1D1F15F6DC9C, 0xB69E38A8965C6B65, 0xAA9119FF184CCCF4, 0xF43C732873F24C13,
+    0xFB4A3D794A9A80D2, 0x3550C2321FD6109C, 0x371F77E76BB8417E, 0x6BFA9AAE5EC05779,
+    0xCD04F3FF001A4778, 0xE3273522064480CA, 0x9F91508BFFCFC14A, 0x049A7F41061A9E60,
+    0xFCB6BE43A9F2FE9B, 0x08DE8A1C7797DA9B, 0x8F9887E6078735A1, 0xB5B4071DBFC73A66,
+    0x230E343DFBA08D33, 0x43ED7F5A0FAE657D, 0x3A88A0FBBCB05C63, 0x21874B8B4D2DBC4F,
+    0x1BDEA12E35F6A8C9, 0x53C065C6C8E63528, 0xE34A1D250E7A8D6B, 0xD6B04D3B7651DD7E,
+    0x5E90277E7CB39E2D, 0x2C046F22062DC67D, 0xB10BB459132D0A26, 0x3FA9DDFB67E2F199,
+    0x0E09B88E1914F7AF, 0x10E8B35AF3EEAB37, 0x9EEDECA8E272B933, 0xD4C718BC4AE8AE5F,
+    0x81536D601170FC20, 0x91B534F885818A06, 0xEC8177F83F900978, 0x190E714FADA5156E,
+    0xB592BF39B0364963, 0x89C350C893AE7DC1, 0xAC042E70F8B383F2, 0xB49B52E587A1EE60,
+    0xFB152FE3FF26DA89, 0x3E666E6F69AE2C15, 0x3B544EBE544C19F9, 0xE805A1E290CF2456,
+    0x24B33C9D7ED25117, 0xE74733427B72F0C1, 0x0A804D18B7097475, 0x57E3306D881EDB4F,
+    0x4AE7D6A36EB5DBCB, 0x2D8D5432157064C8, 0xD1E649DE1E7F268B, 0x8A328A1CEDFE552C,
+    0x07A3AEC79624C7DA, 0x84547DDC3E203C94, 0x990A98FD5071D263, 0x1A4FF12616EEFC89,
+    0xF6F7FD1431714200, 0x30C05B1BA332F41C, 0x8D2636B81555A786, 0x46C9FEB55D120902,
+    0xCCEC0A73B49C9921, 0x4E9D2827355FC492, 0x19EBB029435DCB0F, 0x4659D2B743848A2C,
+    0x963EF2C96B33BE31, 0x74F85198B05A2E7D, 0x5A0F544DD2B1FB18, 0x03727073C2E134B1,
+    0xC7F6AA2DE59AEA61, 0x352787BAA0D7C22F, 0x9853EAB63B5E0B35, 0xABBDCDD7ED5C0860,
+    0xCF05DAF5AC8D77B0, 0x49CAD48CEBF4A71E, 0x7A4C10EC2158C4A6, 0xD9E92AA246BF719E,
+    0x13AE978D09FE5557, 0x730499AF921549FF, 0x4E4B705B92903BA4, 0xFF577222C14F0A3A,
+    0x55B6344CF97AAFAE, 0xB862225B055B6960, 0xCAC09AFBDDD2CDB4, 0xDAF8E9829FE96B5F,
+    0xB5FDFC5D3132C498, 0x310CB380DB6F7503, 0xE87FBB46217A360E, 0x2102AE466EBB1148,
+    0xF8549E1A3AA5E00D, 0x07A69AFDCC42261A, 0xC4C118BFE78FEAAE, 0xF9F4892ED96BD438,
+    0x1AF3DBE25D8F45DA, 0xF5B4B0B0D2DEEEB4, 0x962ACEEFA82E1C84, 0x046E3ECAAF453CE9,
+    0xF05D129681949A4C, 0x964781CE734B3C84, 0x9C2ED44081CE5FBD, 0x522E23F3925E319E,
+    0x177E00F9FC32F791, 0x2BC60A63A6F3B3F2, 0x222BBFAE61725606, 0x486289DDCC3D6780,
+    0x7DC7785B8EFDFC80, 0x8AF38731C02BA980, 0x1FAB64EA29A2DDF7, 0xE4D9429322CD065A,
+    0x9DA058C67844F20C, 0x24C0E332B70019B0, 0x233003B5A6CFE6AD, 0xD586BD01C5C217F6,
+    0x5E5637885F29BC2B, 0x7EBA726D8C94094B, 0x0A56A5F0BFE39272, 0xD79476A84EE20D06,
+    0x9E4C1269BAA4BF37, 0x17EFEE45B0DEE640, 0x1D95B0A5FCF90BC6, 0x93CBE0B699C2585D,
+    0x65FA4F227A2B6D79, 0xD5F9E858292504D5, 0xC2B5A03F71471A6F, 0x59300222B4561E00,
+    0xCE2F8642CA0712DC, 0x7CA9723FBB2E8988, 0x2785338347F2BA08, 0xC61BB3A141E50E8C,
+    0x150F361DAB9DEC26, 0x9F6A419D382595F4, 0x64A53DC924FE7AC9, 0x142DE49FFF7A7C3D,
+    0x0C335248857FA9E7, 0x0A9C32D5EAE45305, 0xE6C42178C4BBB92E, 0x71F1CE2490D20B07,
+    0xF1BCC3D275AFE51A, 0xE728E8C83C334074, 0x96FBF83A12884624, 0x81A1549FD6573DA5,
+    0x5FA7867CAF35E149, 0x56986E2EF3ED091B, 0x917F1DD5F8886C61, 0xD20D8C88C8FFE65F,
+    0x31D71DCE64B2C310, 0xF165B587DF898190, 0xA57E6339DD2CF3A0, 0x1EF6E6DBB1961EC9,
+    0x70CC73D90BC26E24, 0xE21A6B35DF0C3AD7, 0x003A93D8B2806962, 0x1C99DED33CB890A1,
+    0xCF3145DE0ADD4289, 0xD0E4427A5514FB72, 0x77C621CC9FB3A483, 0x67A34DAC4356550B,
+    0xF8D626AAAF278509,
+]
+POLYGLOT_PIECE_KINDS = ('bp', 'wp', 'bN', 'wN', 'bB', 'wB', 'bR', 'wR', 'bQ', 'wQ', 'bK', 'wK')
+ZOBRIST_PIECES = {piece: [ZOBRIST_RANDOMS[64 * kind + 8 * (7 - (sq >> 3)) + (sq & 7)] for sq in range(64)]
+                  for kind, piece in enumerate(POLYGLOT_PIECE_KINDS)}
+# Indexed by the castling mask, so bit order follows WHITE_KINGSIDE .. BLACK_QUEENSIDE.
+ZOBRIST_CASTLING = [0] * 16
+for _mask in range(16):
+    for _bit in range(4):
+        if _mask & (1 << _bit):
+            ZOBRIST_CASTLING[_mask] ^= ZOBRIST_RANDOMS[768 + _bit]
+ZOBRIST_ENPASSANT = ZOBRIST_RANDOMS[772:780]
+ZOBRIST_WHITE_TO_MOVE = ZOBRIST_RANDOMS[780]
+# Pawn-only keys: the pawn entries of ZOBRIST_PIECES, zero for every other piece
+ZOBRIST_PAWNS = {piece: ZOBRIST_PIECES[piece] if piece[1] == 'p' else [0] * 64 for piece in PIECES}
+
+_rookAttackCache = [{} for _ in range(64)]
+_bishopAttackCache = [{} for _ in range(64)]
+
+
+def rookAttacks(sq, occupied):
+    """Squares a rook on sq attacks, memoised on the blockers that matter"""
+    key = occupied & ROOK_MASKS[sq]
+    cache = _rookAttackCache[sq]
+    attacks = cache.get(key)
+    if attacks is None:
+        attacks = cache[key] = _slidingAttacks(sq, key, ROOK_DIRECTIONS)
+    return attacks
+
+
+def bishopAttacks(sq, occupied):
+    """Squares a bishop on sq attacks, memoised on the blockers that matter"""
+    key = occupied & BISHOP_MASKS[sq]
+    cache = _bishopAttackCache[sq]
+    attacks = cache.get(key)
+    if attacks is None:
+        attacks = cache[key] = _slidingAttacks(sq, key, BISHOP_DIRECTIONS)
+    return attacks
+
+
+def popCount(bb):
+    return bin(bb).count('1')
+
+
 class GameState():
     def __init__(self):
-        self.board = [
+        board = [
             ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
             ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
             ["--", "--", "--", "--", "--", "--", "--", "--"],
@@ -11,138 +391,305 @@ class GameState():
             ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]]
         self.moveFunctions = {'p': self.getPawnMoves, 'R': self.getRookMoves, 'N': self.getKnightMoves,
                               'B': self.getBishopMoves, 'Q': self.getQueenMoves, 'K': self.getKingMoves}
+        self.loadBoard(board)
         self.whiteToMove = True
         self.moveLog = []
-        self.whiteKingLocation = (7, 4)
-        self.blackKingLocation = (0, 4)
         self.checkmate = False
         self.stalemate = False
-        self.enpassantPossible = ()
-        self.enpassantPossibleLog = [self.enpassantPossible]
-        self.currentCastlingRight = CastleRights(True, True, True, True)
-        self.castleRightsLog = [CastleRights(self.currentCastlingRight.wks, self.currentCastlingRight.bks,
-                                             self.currentCastlingRight.wqs, self.currentCastlingRight.bqs)]
+        self.enpassantSquare = -1
+        self.castleRights = ALL_CASTLING
+        self.halfmoveClock = 0
+        self.startPly = 0
+        self.history = [0] * (HISTORY_BLOCK * HISTORY_STRIDE)
+        self.nullMoveHistory = []
+        self.zobrist = self.computeZobrist()
+
+    @classmethod
+    def fromFEN(cls, fen):
+        """GameState for the position described by a FEN string"""
+        gs = cls()
+        gs.loadFEN(fen)
+        return gs
+
+    def loadFEN(self, fen):
+        """Replace the position with the one in a FEN string, clearing the move log; raises ValueError if malformed"""
+        fields = fen.split()
+        if len(fields) == 4:
+            fields += ['0', '1']
+        if len(fields) != 6:
+            raise ValueError(f"FEN needs 6 fields, got {len(fields)}: {fen!r}")
+        placement, side, castling, enpassant, halfmove, fullmove = fields
+
+        board = []
+        for rank in placement.split('/'):
+            row = []
+            for ch in rank:
+                if ch.isdigit():
+                    row.extend(['--'] * int(ch))
+                elif ch in 'PNBRQK':
+                    row.append('w' + ('p' if ch == 'P' else ch))
+                elif ch in 'pnbrqk':
+                    row.append('b' + ('p' if ch == 'p' else ch.upper()))
+                else:
+                    raise ValueError(f"Unknown piece {ch!r} in FEN: {fen!r}")
+            if len(row) != 8:
+                raise ValueError(f"FEN rank {rank!r} does not cover 8 squares")
+            board.append(row)
+        if len(board) != 8:
+            raise ValueError(f"FEN placement needs 8 ranks, got {len(board)}")
+        if side not in ('w', 'b'):
+            raise ValueError(f"FEN side to move must be 'w' or 'b', got {side!r}")
+        if castling != '-' and not set(castling) <= set('KQkq'):
+            raise ValueError(f"Bad FEN castling field {castling!r}")
+        if enpassant != '-' and (len(enpassant) != 2 or enpassant[0] not in Move.filesToCols or enpassant[1] not in '36'):
+            raise ValueError(f"Bad FEN en passant field {enpassant!r}")
+        if not halfmove.isdigit() or not fullmove.isdigit():
+            raise ValueError(f"FEN move counters must be numbers: {halfmove!r} {fullmove!r}")
+
+        self.loadBoard(board)
+        if not self.bitboards['wK'] or not self.bitboards['bK']:
+            raise ValueError(f"FEN must place both kings: {fen!r}")
+        self.whiteToMove = side == 'w'
+        self.moveLog = []
+        self.checkmate = False
+        self.stalemate = False
+        self.castleRights = sum(bit for flag, bit in CASTLING_FLAGS if flag in castling)
+        # A right whose king or rook is not on its home square can never be used, whatever the FEN says
+        for sq, piece in CASTLING_HOMES:
+            if self.squares[sq] != piece:
+                self.castleRights &= CASTLING_KEPT[sq]
+        self.enpassantSquare = -1
+        if enpassant != '-':
+            sq = Move.ranksToRows[enpassant[1]] * 8 + Move.filesToCols[enpassant[0]]
+            # Likewise a target square is kept only behind an enemy pawn that can just have moved two squares past it
+            pawnSq, originSq = (sq + 8, sq - 8) if self.whiteToMove else (sq - 8, sq + 8)
+            enemyPawn = 'bp' if self.whiteToMove else 'wp'
+            if (enpassant[1] == ('6' if self.whiteToMove else '3') and self.squares[pawnSq] == enemyPawn
+                    and self.squares[sq] == '--' and self.squares[originSq] == '--'):
+                self.enpassantSquare = sq
+        self.halfmoveClock = int(halfmove)
+        self.startPly = 2 * (max(int(fullmove), 1) - 1) + (0 if self.whiteToMove else 1)
+        self.zobrist = self.computeZobrist()
+
+    def toFEN(self):
+        """FEN string for the current position, move counters included"""
+        ranks = []
+        for r in range(8):
+            rank = ''
+            empty = 0
+            for piece in self.squares[r * 8:r * 8 + 8]:
+                if piece == '--':
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece[1].upper() if piece[0] == 'w' else piece[1].lower()
+            ranks.append(rank + (str(empty) if empty else ''))
+        castling = ''.join(flag for flag, bit in CASTLING_FLAGS if self.castleRights & bit) or '-'
+        sq = self.enpassantSquare
+        enpassant = Move.colsToFiles[sq & 7] + Move.rowsToRanks[sq >> 3] if sq >= 0 else '-'
+        fullmove = (self.startPly + len(self.moveLog)) // 2 + 1
+        return ' '.join(('/'.join(ranks), 'w' if self.whiteToMove else 'b', castling, enpassant,
+                         str(self.halfmoveClock), str(fullmove)))
+
+    def loadBoard(self, board):
+        """Fill the bitboards and square list from an 8x8 grid of piece strings"""
+        self.bitboards = {piece: 0 for piece in PIECES}
+        self.occupancy = {'w': 0, 'b': 0}
+        self.squares = ['--'] * 64
+        self.zobrist = 0
+        self.pawnZobrist = 0
+        self.pieceSquareScore = 0
+        for r in range(8):
+            for c in range(8):
+                piece = board[r][c]
+                if piece != '--':
+                    self.putPiece(piece, r * 8 + c)
+        self._boardView = None
+
+    def putPiece(self, piece, sq):
+        bit = SQUARE_BITS[sq]
+        self.bitboards[piece] |= bit
+        self.occupancy[piece[0]] |= bit
+        self.squares[sq] = piece
+        self.zobrist ^= ZOBRIST_PIECES[piece][sq]
+        self.pawnZobrist ^= ZOBRIST_PAWNS[piece][sq]
+        self.pieceSquareScore += PIECE_SQUARE_SCORES[piece][sq]
+
+    def removePiece(self, piece, sq):
+        bit = SQUARE_BITS[sq]
+        self.bitboards[piece] ^= bit
+        self.occupancy[piece[0]] ^= bit
+        self.squares[sq] = '--'
+        self.zobrist ^= ZOBRIST_PIECES[piece][sq]
+        self.pawnZobrist ^= ZOBRIST_PAWNS[piece][sq]
+        self.pieceSquareScore -= PIECE_SQUARE_SCORES[piece][sq]
+
+    def computeZobrist(self):
+        """Zobrist key of the current position built from scratch; makeMove/undoMove keep it up to date"""
+        key = 0
+        for sq, piece in enumerate(self.squares):
+            if piece != '--':
+                key ^= ZOBRIST_PIECES[piece][sq]
+        key ^= ZOBRIST_CASTLING[self.castleRights] ^ self.enpassantZobrist()
+        if self.whiteToMove:
+            key ^= ZOBRIST_WHITE_TO_MOVE
+        return key
+
+    def enpassantZobrist(self):
+        # As in Polyglot, the en passant file only counts when a pawn of the side to move can take it.
+        sq = self.enpassantSquare
+        if sq < 0:
+            return 0
+        if self.whiteToMove:
+            capturers = PAWN_ATTACKS['b'][sq] & self.bitboards['wp']
+        else:
+            capturers = PAWN_ATTACKS['w'][sq] & self.bitboards['bp']
+        return ZOBRIST_ENPASSANT[sq & 7] if capturers else 0
+
+    @property
+    def board(self):
+        """8x8 grid of piece strings, rebuilt from the square list only when the position has changed"""
+        if self._boardView is None:
+            squares = self.squares
+            self._boardView = [squares[i:i + 8] for i in range(0, 64, 8)]
+        return self._boardView
+
+    @property
+    def evalTerms(self):
+        """(middlegame score, endgame score, game phase) of the pieces on their squares, kept up to date by
+        putPiece/removePiece; scores are White-relative centipawns from the ChessEval tables"""
+        return unpackScore(self.pieceSquareScore)
+
+    @property
+    def enpassantPossible(self):
+        sq = self.enpassantSquare
+        return (sq >> 3, sq & 7) if sq >= 0 else ()
+
+    @enpassantPossible.setter
+    def enpassantPossible(self, square):
+        self.enpassantSquare = square[0] * 8 + square[1] if square else -1
+
+    @property
+    def currentCastlingRight(self):
+        rights = self.castleRights
+        return CastleRights(bool(rights & WHITE_KINGSIDE), bool(rights & BLACK_KINGSIDE),
+                            bool(rights & WHITE_QUEENSIDE), bool(rights & BLACK_QUEENSIDE))
+
+    @property
+    def whiteKingLocation(self):
+        sq = self.bitboards['wK'].bit_length() - 1
+        return (sq >> 3, sq & 7)
+
+    @property
+    def blackKingLocation(self):
+        sq = self.bitboards['bK'].bit_length() - 1
+        return (sq >> 3, sq & 7)
 
     def makeMove(self, move):
-        self.board[move.startRow][move.startCol] = "--"
-        self.board[move.endRow][move.endCol] = move.pieceMoved
-        self.moveLog.append(move)
-        self.whiteToMove = not self.whiteToMove
-        
-        if move.pieceMoved == 'wK':
-            self.whiteKingLocation = (move.endRow, move.endCol)
-        elif move.pieceMoved == 'bK':
-            self.blackKingLocation = (move.endRow, move.endCol)
+        code = move.code
+        startSq = code & 63
+        endSq = (code >> 6) & 63
+        pieceMoved = PIECE_NAMES[code >> MOVED_SHIFT]
+        pieceCaptured = PIECE_NAMES[(code >> CAPTURED_SHIFT) & 15]
 
-        if move.isPawnPromotion:
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + move.promotionChoice
+        history = self.history
+        i = len(self.moveLog) * HISTORY_STRIDE
+        if i == len(history):
+            history.extend([0] * (HISTORY_BLOCK * HISTORY_STRIDE))
+        history[i] = self.castleRights
+        history[i + 1] = self.enpassantSquare
+        history[i + 2] = pieceCaptured
+        history[i + 3] = self.zobrist
+        history[i + 4] = self.halfmoveClock
 
-        if move.isEnpassantMove:
-            self.board[move.startRow][move.endCol] = '--'
+        self.zobrist ^= ZOBRIST_CASTLING[self.castleRights] ^ self.enpassantZobrist() ^ ZOBRIST_WHITE_TO_MOVE
+        if code & MOVE_ENPASSANT:
+            self.removePiece(pieceCaptured, (startSq & 56) | (endSq & 7))
+        elif pieceCaptured != '--':
+            self.removePiece(pieceCaptured, endSq)
+        self.removePiece(pieceMoved, startSq)
+        if code & MOVE_PROMOTION:
+            self.putPiece(pieceMoved[0] + PROMOTION_PIECES[(code >> PROMOTION_SHIFT) & 3], endSq)
+        else:
+            self.putPiece(pieceMoved, endSq)
+        self.moveLog.append(move)
+        self.whiteToMove = not self.whiteToMove
 
-        if move.pieceMoved[1] == 'p' and abs(move.startRow - move.endRow) == 2:
-            self.enpassantPossible = ((move.startRow + move.endRow) // 2, move.startCol)
+        if pieceMoved[1] == 'p':
+            self.halfmoveClock = 0
+            if startSq - endSq == 16 or endSq - startSq == 16:
+                self.enpassantSquare = (startSq + endSq) >> 1
+            else:
+                self.enpassantSquare = -1
         else:
-            self.enpassantPossible = ()
+            self.halfmoveClock = 0 if pieceCaptured != '--' else self.halfmoveClock + 1
+            self.enpassantSquare = -1
 
-        if move.isCastleMove:
-            if move.endCol - move.startCol == 2:
-                self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][move.endCol + 1]
-                self.board[move.endRow][move.endCol + 1] = '--'
+        if code & MOVE_CASTLE:
+            rook = pieceMoved[0] + 'R'
+            if endSq > startSq:
+                self.removePiece(rook, endSq + 1)
+                self.putPiece(rook, endSq - 1)
             else:
-                self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 2]
-                self.board[move.endRow][move.endCol - 2] = '--'
-
-        self.enpassantPossibleLog.append(self.enpassantPossible)
-        self.updateCastleRights(move)
-        self.castleRightsLog.append(CastleRights(self.currentCastlingRight.wks, self.currentCastlingRight.bks,
-                                                 self.currentCastlingRight.wqs, self.currentCastlingRight.bqs))
-
-    def updateCastleRights(self, move):
-        if move.pieceMoved == 'wK':
-            self.currentCastlingRight.wqs = False
-            self.currentCastlingRight.wks = False
-        elif move.pieceMoved == 'bK':
-            self.currentCastlingRight.bqs = False
-            self.currentCastlingRight.bks = False
-        elif move.pieceMoved == 'wR':
-            if move.startRow == 7:
-                if move.startCol == 0:
-                    self.currentCastlingRight.wqs = False
-                elif move.startCol == 7:
-                    self.currentCastlingRight.wks = False
-        elif move.pieceMoved == 'bR':
-            if move.startRow == 0:
-                if move.startCol == 0:
-                    self.currentCastlingRight.bqs = False
-                elif move.startCol == 7:
-                    self.currentCastlingRight.bks = False
-        
-        if move.pieceCaptured == 'wR':
-            if move.endRow == 7:
-                if move.endCol == 0:
-                    self.currentCastlingRight.wqs = False
-                elif move.endCol == 7:
-                    self.currentCastlingRight.wks = False
-        elif move.pieceCaptured == 'bR':
-            if move.endRow == 0:
-                if move.endCol == 0:
-                    self.currentCastlingRight.bqs = False
-                elif move.endCol == 7:
-                    self.currentCastlingRight.bks = False
+                self.removePiece(rook, endSq - 2)
+                self.putPiece(rook, endSq + 1)
+
+        self.castleRights &= CASTLING_KEPT[startSq] & CASTLING_KEPT[endSq]
+        self.zobrist ^= ZOBRIST_CASTLING[self.castleRights] ^ self.enpassantZobrist()
+        self._boardView = None
 
     def undoMove(self):
         if len(self.moveLog) != 0:
             move = self.moveLog.pop()
-            self.board[move.startRow][move.startCol] = move.pieceMoved
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
+            code = move.code
+            startSq = code & 63
+            endSq = (code >> 6) & 63
+            pieceMoved = PIECE_NAMES[code >> MOVED_SHIFT]
+            history = self.history
+            i = len(self.moveLog) * HISTORY_STRIDE
+            pieceCaptured = history[i + 2]
+
+            self.removePiece(self.squares[endSq], endSq)
+            self.putPiece(pieceMoved, startSq)
+            if code & MOVE_ENPASSANT:
+                self.putPiece(pieceCaptured, (startSq & 56) | (endSq & 7))
+            elif pieceCaptured != '--':
+                self.putPiece(pieceCaptured, endSq)
             self.whiteToMove = not self.whiteToMove
-            
-            if move.pieceMoved == 'wK':
-                self.whiteKingLocation = (move.startRow, move.startCol)
-            elif move.pieceMoved == 'bK':
-                self.blackKingLocation = (move.startRow, move.startCol)
-
-            if move.isEnpassantMove:
-                self.board[move.endRow][move.endCol] = '--'
-                self.board[move.startRow][move.endCol] = move.pieceCaptured
-
-            self.enpassantPossibleLog.pop()
-            self.enpassantPossible = self.enpassantPossibleLog[-1]
-
-            self.castleRightsLog.pop()
-            self.currentCastlingRight = CastleRights(self.castleRightsLog[-1].wks, self.castleRightsLog[-1].bks,
-                                                     self.castleRightsLog[-1].wqs, self.castleRightsLog[-1].bqs)
-
-            if move.isCastleMove:
-                if move.endCol - move.startCol == 2:
-                    self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 1]
-                    self.board[move.endRow][move.endCol - 1] = '--'
+
+            if code & MOVE_CASTLE:
+                rook = pieceMoved[0] + 'R'
+                if endSq > startSq:
+                    self.removePiece(rook, endSq - 1)
+                    self.putPiece(rook, endSq + 1)
                 else:
-                    self.board[move.endRow][move.endCol - 2] = self.board[move.endRow][move.endCol + 1]
-                    self.board[move.endRow][move.endCol + 1] = '--'
+                    self.removePiece(rook, endSq + 1)
+                    self.putPiece(rook, endSq - 2)
 
+            self.castleRights = history[i]
+            self.enpassantSquare = history[i + 1]
+            self.zobrist = history[i + 3]
+            self.halfmoveClock = history[i + 4]
+            self._boardView = None
             self.checkmate = False
             self.stalemate = False
 
-    def getValidMoves(self):
-        tempEnpassantPossible = self.enpassantPossible
-        tempCurrentCastleRights = CastleRights(self.currentCastlingRight.wks, self.currentCastlingRight.bks,
-                                               self.currentCastlingRight.wqs, self.currentCastlingRight.bqs)
-        moves = self.getAllPossibleMoves()
-        if self.whiteToMove:
-            self.getCastleMoves(self.whiteKingLocation[0], self.whiteKingLocation[1], moves)
-        else:
-            self.getCastleMoves(self.blackKingLocation[0], self.blackKingLocation[1], moves)
+    def makeNullMove(self):
+        """Pass the turn without moving a piece, for null-move pruning; never legal in a game and not logged"""
+        self.nullMoveHistory.append((self.enpassantSquare, self.zobrist))
+        self.zobrist ^= self.enpassantZobrist() ^ ZOBRIST_WHITE_TO_MOVE
+        self.enpassantSquare = -1
+        self.whiteToMove = not self.whiteToMove
 
-        for i in range(len(moves) - 1, -1, -1):
-            self.makeMove(moves[i])
-            self.whiteToMove = not self.whiteToMove
-            if self.inCheck():
-                moves.remove(moves[i])
-            self.whiteToMove = not self.whiteToMove
-            self.undoMove()
+    def undoNullMove(self):
+        self.enpassantSquare, self.zobrist = self.nullMoveHistory.pop()
+        self.whiteToMove = not self.whiteToMove
 
+    def getValidMoves(self):
+        """Legal moves, worked out from the checkers and pinned pieces instead of trying each move"""
+        moves = self.generateMoves(True, True)
         if len(moves) == 0:
             if self.inCheck():
                 self.checkmate = True
@@ -151,149 +698,398 @@ class GameState():
         else:
             self.checkmate = False
             self.stalemate = False
+        return moves
+
+    def getCaptureMoves(self):
+        """Legal captures and promotions only, for the quiescence search"""
+        return self.generateMoves(True, False)
+
+    def getStagedMoves(self, hashMove=0, killers=(), history=None):
+        """Legal moves produced one stage at a time: the hash move, captures that do not lose material (see) and
+        promotions in MVV-LVA order, killer moves, the remaining quiet moves (best history score first when a history
+        table indexed by from/to is given), then losing captures. hashMove and killers are from/to square codes
+        (code & MOVE_SQUARES); a stage is only generated once the caller asks for a move past the previous one."""
+        searched = []
+        if hashMove:
+            move = self.findMove(hashMove, True)
+            if move is not None:
+                searched.append(hashMove)
+                yield move
+        captures = self.generateMoves(True, False)
+        captures.sort(key=mvvLvaScore, reverse=True)
+        losingCaptures = []
+        for move in captures:
+            if move.code & MOVE_SQUARES != hashMove:
+                if self.isLosingCapture(move):
+                    losingCaptures.append(move)
+                else:
+                    yield move
+        for killer in killers:
+            if killer and killer not in searched:
+                move = self.findMove(killer, False)
+                if move is not None:
+                    searched.append(killer)
+                    yield move
+        quietMoves = self.generateMoves(False, True)
+        if history is not None:
+            quietMoves.sort(key=lambda move: history[move.code & MOVE_SQUARES], reverse=True)
+        for move in quietMoves:
+            if move.code & MOVE_SQUARES not in searched:
+                yield move
+        yield from losingCaptures
+
+    def isLosingCapture(self, move):
+        """True if the exchange started by a capture loses material; captures of an equal or bigger piece and
+        promotions never do"""
+        code = move.code
+        if code & MOVE_PROMOTION:
+            return False
+        if SEE_VALUES[PIECE_NAMES[(code >> CAPTURED_SHIFT) & 15][1]] >= SEE_VALUES[PIECE_NAMES[code >> MOVED_SHIFT][1]]:
+            return False
+        return self.see(move) < 0
+
+    def see(self, move):
+        """Static exchange evaluation: material the mover nets (in SEE_VALUES pawns) if both sides keep recapturing
+        on the target square with their least valuable attacker and may stop whenever that is better"""
+        code = move.code
+        fromSq = code & 63
+        toSq = (code >> 6) & 63
+        bitboards = self.bitboards
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        pieceMoved = PIECE_NAMES[code >> MOVED_SHIFT]
+        pieceCaptured = PIECE_NAMES[(code >> CAPTURED_SHIFT) & 15]
+        gain = [SEE_VALUES[pieceCaptured[1]] if pieceCaptured != '--' else 0]
+        attackerValue = SEE_VALUES[pieceMoved[1]]
+        if code & MOVE_PROMOTION:
+            gain[0] += SEE_VALUES['Q'] - SEE_VALUES['p']
+            attackerValue = SEE_VALUES['Q']
+        if code & MOVE_ENPASSANT:
+            occupied ^= SQUARE_BITS[(fromSq & 56) | (toSq & 7)]
+        occupied ^= SQUARE_BITS[fromSq]
+        color = 'b' if pieceMoved[0] == 'w' else 'w'
+        while True:
+            attackers = self.attackersTo(toSq, color, occupied) & occupied
+            if not attackers:
+                break
+            for kind in SEE_ORDER:
+                pieces = attackers & bitboards[color + kind]
+                if pieces:
+                    break
+            gain.append(attackerValue - gain[-1])
+            if max(-gain[-2], gain[-1]) < 0:
+                # Neither side wants to continue, so this capture does not change the result
+                gain.pop()
+                break
+            occupied ^= pieces & -pieces
+            attackerValue = SEE_VALUES[kind]
+            color = 'b' if color == 'w' else 'w'
+        while len(gain) > 1:
+            last = gain.pop()
+            gain[-1] = -max(-gain[-1], last)
+        return gain[0]
+
+    def findMove(self, squares, captures):
+        """The legal move with the given from/to square code (quiet moves only unless captures is set), or None"""
+        for move in self.generateMoves(captures, True, SQUARE_BITS[squares & 63]):
+            if move.code & MOVE_SQUARES == squares:
+                return move
+        return None
+
+    def generateMoves(self, captures, quiets, fromMask=ALL_SQUARES):
+        """Legal moves restricted to captures (including en passant and promotions) and/or the remaining quiet moves,
+        for the pieces on fromMask"""
+        color = 'w' if self.whiteToMove else 'b'
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        bitboards = self.bitboards
+        squares = self.squares
+        own = self.occupancy[color]
+        enemy = self.occupancy[enemyColor]
+        occupied = own | enemy
+        kingBit = bitboards[color + 'K']
+        kingSq = kingBit.bit_length() - 1
+        checkers = self.attackersTo(kingSq, enemyColor, occupied)
+        if not checkers:
+            evasions = ALL_SQUARES
+        elif checkers & (checkers - 1):
+            evasions = 0
+        else:
+            evasions = checkers | BETWEEN[kingSq][checkers.bit_length() - 1]
+        pinned = self.pinnedPieces(kingSq, color, occupied) if evasions else 0
+        kingLine = LINE[kingSq]
+        if not quiets:
+            pieceMask = enemy
+            pawnMask = enemy | PROMOTION_RANKS
+        elif not captures:
+            pieceMask = ~occupied
+            pawnMask = ~occupied & ~PROMOTION_RANKS
+        else:
+            pieceMask = pawnMask = ALL_SQUARES
+        moves = []
 
-        self.enpassantPossible = tempEnpassantPossible
-        self.currentCastlingRight = tempCurrentCastleRights
+        pieces = own & fromMask
+        while pieces:
+            lsb = pieces & -pieces
+            sq = lsb.bit_length() - 1
+            pieces ^= lsb
+            kind = squares[sq][1]
+            if kind == 'K':
+                targets = KING_ATTACKS[sq] & ~own & pieceMask
+                safe = 0
+                while targets:
+                    bit = targets & -targets
+                    targets ^= bit
+                    if not self.isSquareAttacked(bit.bit_length() - 1, enemyColor, occupied ^ kingBit):
+                        safe |= bit
+                self.addMoves(sq, safe, moves)
+                continue
+            if not evasions:
+                continue
+            if kind == 'p':
+                if color == 'w':
+                    push = SQUARE_BITS[sq - 8] & ~occupied
+                    if push and sq >= 48:
+                        push |= SQUARE_BITS[sq - 16] & ~occupied
+                else:
+                    push = SQUARE_BITS[sq + 8] & ~occupied
+                    if push and sq < 16:
+                        push |= SQUARE_BITS[sq + 16] & ~occupied
+                attacks = PAWN_ATTACKS[color][sq]
+                targets = (push | (attacks & enemy)) & evasions & pawnMask
+                if lsb & pinned:
+                    targets &= kingLine[sq]
+                self.addPawnMoves(sq, targets, moves)
+                epSq = self.enpassantSquare
+                if captures and epSq >= 0 and attacks & SQUARE_BITS[epSq]:
+                    if self.enpassantIsLegal(sq, epSq, (sq & 56) | (epSq & 7), kingSq, checkers, occupied):
+                        self.addEnpassantMove(sq, epSq, moves)
+                continue
+            if kind == 'N':
+                targets = KNIGHT_ATTACKS[sq] & ~own & evasions
+            elif kind == 'B':
+                targets = bishopAttacks(sq, occupied) & ~own & evasions
+            elif kind == 'R':
+                targets = rookAttacks(sq, occupied) & ~own & evasions
+            else:
+                targets = (rookAttacks(sq, occupied) | bishopAttacks(sq, occupied)) & ~own & evasions
+            targets &= pieceMask
+            if lsb & pinned:
+                targets &= kingLine[sq]
+            self.addMoves(sq, targets, moves)
+
+        if quiets and not checkers and kingBit & fromMask:
+            self.getCastleMoves(kingSq >> 3, kingSq & 7, moves)
         return moves
 
+    def attackersTo(self, sq, color, occupied):
+        """Bitboard of the given side's pieces attacking sq, with sliders blocked by occupied"""
+        bitboards = self.bitboards
+        queens = bitboards[color + 'Q']
+        attackers = ((PAWN_ATTACKS['b' if color == 'w' else 'w'][sq] & bitboards[color + 'p'])
+                     | (KNIGHT_ATTACKS[sq] & bitboards[color + 'N'])
+                     | (KING_ATTACKS[sq] & bitboards[color + 'K']))
+        rooks = (bitboards[color + 'R'] | queens) & ROOK_RAYS[sq]
+        if rooks:
+            attackers |= rookAttacks(sq, occupied) & rooks
+        bishops = (bitboards[color + 'B'] | queens) & BISHOP_RAYS[sq]
+        if bishops:
+            attackers |= bishopAttacks(sq, occupied) & bishops
+        return attackers
+
+    def pinnedPieces(self, kingSq, color, occupied):
+        """Bitboard of the given side's pieces pinned to their king by an enemy slider"""
+        enemyColor = 'b' if color == 'w' else 'w'
+        bitboards = self.bitboards
+        queens = bitboards[enemyColor + 'Q']
+        snipers = ((rookAttacks(kingSq, 0) & (bitboards[enemyColor + 'R'] | queens))
+                   | (bishopAttacks(kingSq, 0) & (bitboards[enemyColor + 'B'] | queens)))
+        pinned = 0
+        between = BETWEEN[kingSq]
+        while snipers:
+            lsb = snipers & -snipers
+            snipers ^= lsb
+            blockers = between[lsb.bit_length() - 1] & occupied
+            if blockers and not blockers & (blockers - 1):
+                pinned |= blockers & self.occupancy[color]
+        return pinned
+
+    def enpassantIsLegal(self, fromSq, toSq, capturedSq, kingSq, checkers, occupied):
+        # Both pawns leave the king's lines at once, so sliders are rechecked on the board after the capture.
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        bitboards = self.bitboards
+        if checkers & ~SQUARE_BITS[capturedSq] & (bitboards[enemyColor + 'N'] | bitboards[enemyColor + 'p']):
+            return False
+        after = (occupied ^ SQUARE_BITS[fromSq] ^ SQUARE_BITS[capturedSq]) | SQUARE_BITS[toSq]
+        queens = bitboards[enemyColor + 'Q']
+        return not ((rookAttacks(kingSq, after) & (bitboards[enemyColor + 'R'] | queens))
+                    or (bishopAttacks(kingSq, after) & (bitboards[enemyColor + 'B'] | queens)))
+
+    def hasNonPawnMaterial(self, color):
+        """True if the side has a knight, bishop, rook or queen"""
+        bitboards = self.bitboards
+        return bool(bitboards[color + 'N'] | bitboards[color + 'B'] | bitboards[color + 'R'] | bitboards[color + 'Q'])
+
     def inCheck(self):
-        if self.whiteToMove:
-            return self.squareUnderAttack(self.whiteKingLocation[0], self.whiteKingLocation[1])
-        else:
-            return self.squareUnderAttack(self.blackKingLocation[0], self.blackKingLocation[1])
+        color = 'w' if self.whiteToMove else 'b'
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        return self.isSquareAttacked(self.bitboards[color + 'K'].bit_length() - 1, enemyColor, occupied)
 
     def squareUnderAttack(self, r, c):
-        self.whiteToMove = not self.whiteToMove
-        oppMoves = self.getAllPossibleMoves()
-        self.whiteToMove = not self.whiteToMove
-        for move in oppMoves:
-            if move.endRow == r and move.endCol == c:
-                return True
-        return False
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        return self.isSquareAttacked(r * 8 + c, enemyColor, self.occupancy['w'] | self.occupancy['b'])
+
+    def isSquareAttacked(self, sq, color, occupied):
+        """Whether the given side attacks sq, looking outward from sq and stopping at the first attacker"""
+        bitboards = self.bitboards
+        if PAWN_ATTACKS['b' if color == 'w' else 'w'][sq] & bitboards[color + 'p']:
+            return True
+        if KNIGHT_ATTACKS[sq] & bitboards[color + 'N'] or KING_ATTACKS[sq] & bitboards[color + 'K']:
+            return True
+        queens = bitboards[color + 'Q']
+        rooks = bitboards[color + 'R'] | queens
+        if rooks & ROOK_RAYS[sq] and rookAttacks(sq, occupied) & rooks:
+            return True
+        bishops = bitboards[color + 'B'] | queens
+        return bool(bishops & BISHOP_RAYS[sq] and bishopAttacks(sq, occupied) & bishops)
+
+    def attackersOf(self, square, colour):
+        """Bitboard of colour's pieces attacking the (row, col) square on the current board"""
+        return self.attackersTo(square[0] * 8 + square[1], colour, self.occupancy['w'] | self.occupancy['b'])
+
+    def mobility(self, color):
+        """Number of squares the side's knights, bishops, rooks and queens can move to, ignoring pins and checks;
+        counted straight from attack bitboards without building moves"""
+        bitboards = self.bitboards
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        free = ~self.occupancy[color]
+        count = 0
+        bb = bitboards[color + 'N']
+        while bb:
+            lsb = bb & -bb
+            count += popCount(KNIGHT_ATTACKS[lsb.bit_length() - 1] & free)
+            bb ^= lsb
+        bb = bitboards[color + 'B'] | bitboards[color + 'Q']
+        while bb:
+            lsb = bb & -bb
+            count += popCount(bishopAttacks(lsb.bit_length() - 1, occupied) & free)
+            bb ^= lsb
+        bb = bitboards[color + 'R'] | bitboards[color + 'Q']
+        while bb:
+            lsb = bb & -bb
+            count += popCount(rookAttacks(lsb.bit_length() - 1, occupied) & free)
+            bb ^= lsb
+        return count
 
     def getAllPossibleMoves(self):
         moves = []
-        for r in range(len(self.board)):
-            for c in range(len(self.board[r])):
-                turn = self.board[r][c][0]
-                if (turn == 'w' and self.whiteToMove) or (turn == 'b' and not self.whiteToMove):
-                    piece = self.board[r][c][1]
-                    self.moveFunctions[piece](r, c, moves)
+        own = self.occupancy['w' if self.whiteToMove else 'b']
+        while own:
+            lsb = own & -own
+            sq = lsb.bit_length() - 1
+            own ^= lsb
+            self.moveFunctions[self.squares[sq][1]](sq >> 3, sq & 7, moves)
         return moves
 
+    def addMoves(self, sq, targets, moves):
+        squares = self.squares
+        base = sq | MOVED_BITS[squares[sq]]
+        while targets:
+            lsb = targets & -targets
+            target = lsb.bit_length() - 1
+            targets ^= lsb
+            code = base | target << 6 | CAPTURED_BITS[squares[target]]
+            moves.append(_movePool.get(code) or Move.fromCode(code))
+
+    def addPawnMoves(self, sq, targets, moves):
+        squares = self.squares
+        base = sq | MOVED_BITS[squares[sq]]
+        while targets:
+            lsb = targets & -targets
+            target = lsb.bit_length() - 1
+            targets ^= lsb
+            code = base | target << 6 | CAPTURED_BITS[squares[target]]
+            if lsb & PROMOTION_RANKS:
+                code |= MOVE_PROMOTION
+            moves.append(_movePool.get(code) or Move.fromCode(code))
+
+    def addEnpassantMove(self, sq, epSq, moves):
+        pawn = self.squares[sq]
+        captured = 'bp' if pawn == 'wp' else 'wp'
+        moves.append(Move.fromCode(sq | epSq << 6 | MOVE_ENPASSANT | CAPTURED_BITS[captured] | MOVED_BITS[pawn]))
+
     def getPawnMoves(self, r, c, moves):
+        sq = r * 8 + c
         if self.whiteToMove:
-            if self.board[r - 1][c] == "--":
-                moves.append(Move((r, c), (r - 1, c), self.board))
-                if r == 6 and self.board[r - 2][c] == "--":
-                    moves.append(Move((r, c), (r - 2, c), self.board))
-            if c - 1 >= 0:
-                if self.board[r - 1][c - 1][0] == 'b':
-                    moves.append(Move((r, c), (r - 1, c - 1), self.board))
-                elif (r - 1, c - 1) == self.enpassantPossible:
-                    moves.append(Move((r, c), (r - 1, c - 1), self.board, isEnpassantMove=True))
-            if c + 1 <= 7:
-                if self.board[r - 1][c + 1][0] == 'b':
-                    moves.append(Move((r, c), (r - 1, c + 1), self.board))
-                elif (r - 1, c + 1) == self.enpassantPossible:
-                    moves.append(Move((r, c), (r - 1, c + 1), self.board, isEnpassantMove=True))
+            color, enemyColor, step, startRow = 'w', 'b', -8, 6
         else:
-            if self.board[r + 1][c] == "--":
-                moves.append(Move((r, c), (r + 1, c), self.board))
-                if r == 1 and self.board[r + 2][c] == "--":
-                    moves.append(Move((r, c), (r + 2, c), self.board))
-            if c - 1 >= 0:
-                if self.board[r + 1][c - 1][0] == 'w':
-                    moves.append(Move((r, c), (r + 1, c - 1), self.board))
-                elif (r + 1, c - 1) == self.enpassantPossible:
-                    moves.append(Move((r, c), (r + 1, c - 1), self.board, isEnpassantMove=True))
-            if c + 1 <= 7:
-                if self.board[r + 1][c + 1][0] == 'w':
-                    moves.append(Move((r, c), (r + 1, c + 1), self.board))
-                elif (r + 1, c + 1) == self.enpassantPossible:
-                    moves.append(Move((r, c), (r + 1, c + 1), self.board, isEnpassantMove=True))
+            color, enemyColor, step, startRow = 'b', 'w', 8, 1
+        empty = ~(self.occupancy['w'] | self.occupancy['b'])
+        targets = 0
+        if empty & SQUARE_BITS[sq + step]:
+            targets = SQUARE_BITS[sq + step]
+            if r == startRow and empty & SQUARE_BITS[sq + 2 * step]:
+                targets |= SQUARE_BITS[sq + 2 * step]
+        attacks = PAWN_ATTACKS[color][sq]
+        self.addPawnMoves(sq, targets | (attacks & self.occupancy[enemyColor]), moves)
+        epSq = self.enpassantSquare
+        if epSq >= 0 and attacks & SQUARE_BITS[epSq]:
+            self.addEnpassantMove(sq, epSq, moves)
 
     def getRookMoves(self, r, c, moves):
-        directions = [(-1, 0), (0, -1), (1, 0), (0, 1)]
-        enemyColor = 'b' if self.whiteToMove else 'w'
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece == "--":
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
-                    elif endPiece[0] == enemyColor:
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
-                        break
-                    else:
-                        break
-                else:
-                    break
+        own = self.occupancy['w' if self.whiteToMove else 'b']
+        attacks = rookAttacks(r * 8 + c, self.occupancy['w'] | self.occupancy['b'])
+        self.addMoves(r * 8 + c, attacks & ~own, moves)
 
     def getKnightMoves(self, r, c, moves):
-        knightMoves = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
-        allyColor = 'w' if self.whiteToMove else 'b'
-        for m in knightMoves:
-            endRow = r + m[0]
-            endCol = c + m[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] != allyColor:
-                    moves.append(Move((r, c), (endRow, endCol), self.board))
+        own = self.occupancy['w' if self.whiteToMove else 'b']
+        self.addMoves(r * 8 + c, KNIGHT_ATTACKS[r * 8 + c] & ~own, moves)
 
     def getBishopMoves(self, r, c, moves):
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        enemyColor = 'b' if self.whiteToMove else 'w'
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece == "--":
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
-                    elif endPiece[0] == enemyColor:
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
-                        break
-                    else:
-                        break
-                else:
-                    break
+        own = self.occupancy['w' if self.whiteToMove else 'b']
+        attacks = bishopAttacks(r * 8 + c, self.occupancy['w'] | self.occupancy['b'])
+        self.addMoves(r * 8 + c, attacks & ~own, moves)
 
     def getQueenMoves(self, r, c, moves):
         self.getRookMoves(r, c, moves)
         self.getBishopMoves(r, c, moves)
 
     def getKingMoves(self, r, c, moves):
-        kingMoves = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        allyColor = 'w' if self.whiteToMove else 'b'
-        for m in kingMoves:
-            endRow = r + m[0]
-            endCol = c + m[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] != allyColor:
-                    moves.append(Move((r, c), (endRow, endCol), self.board))
+        own = self.occupancy['w' if self.whiteToMove else 'b']
+        self.addMoves(r * 8 + c, KING_ATTACKS[r * 8 + c] & ~own, moves)
 
     def getCastleMoves(self, r, c, moves):
-        if self.squareUnderAttack(r, c):
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        if self.isSquareAttacked(r * 8 + c, enemyColor, occupied):
             return
-        if (self.whiteToMove and self.currentCastlingRight.wks) or (not self.whiteToMove and self.currentCastlingRight.bks):
+        if self.castleRights & (WHITE_KINGSIDE if self.whiteToMove else BLACK_KINGSIDE):
             self.getKingsideCastleMoves(r, c, moves)
-        if (self.whiteToMove and self.currentCastlingRight.wqs) or (not self.whiteToMove and self.currentCastlingRight.bqs):
+        if self.castleRights & (WHITE_QUEENSIDE if self.whiteToMove else BLACK_QUEENSIDE):
             self.getQueensideCastleMoves(r, c, moves)
 
     def getKingsideCastleMoves(self, r, c, moves):
-        if self.board[r][c + 1] == '--' and self.board[r][c + 2] == '--':
-            if not self.squareUnderAttack(r, c + 1) and not self.squareUnderAttack(r, c + 2):
-                moves.append(Move((r, c), (r, c + 2), self.board, isCastleMove=True))
+        sq = r * 8 + c
+        if self.squares[sq + 1] == '--' and self.squares[sq + 2] == '--':
+            enemyColor = 'b' if self.whiteToMove else 'w'
+            occupied = self.occupancy['w'] | self.occupancy['b']
+            if not self.isSquareAttacked(sq + 1, enemyColor, occupied) and not self.isSquareAttacked(sq + 2, enemyColor, occupied):
+                moves.append(Move.fromCode(sq | (sq + 2) << 6 | MOVE_CASTLE | MOVED_BITS[self.squares[sq]]))
 
     def getQueensideCastleMoves(self, r, c, moves):
-        if self.board[r][c - 1] == '--' and self.board[r][c - 2] == '--' and self.board[r][c - 3] == '--':
-            if not self.squareUnderAttack(r, c - 1) and not self.squareUnderAttack(r, c - 2):
-                moves.append(Move((r, c), (r, c - 2), self.board, isCastleMove=True))
+        sq = r * 8 + c
+        if self.squares[sq - 1] == '--' and self.squares[sq - 2] == '--' and self.squares[sq - 3] == '--':
+            enemyColor = 'b' if self.whiteToMove else 'w'
+            occupied = self.occupancy['w'] | self.occupancy['b']
+            if not self.isSquareAttacked(sq - 1, enemyColor, occupied) and not self.isSquareAttacked(sq - 2, enemyColor, occupied):
+                moves.append(Move.fromCode(sq | (sq - 2) << 6 | MOVE_CASTLE | MOVED_BITS[self.squares[sq]]))
+
+
+def mvvLvaScore(move):
+    code = move.code
+    score = MVV_LVA_RANKS[(code >> CAPTURED_SHIFT) & 15] * 8 - MVV_LVA_RANKS[code >> MOVED_SHIFT]
+    if code & MOVE_PROMOTION:
+        score += 48
+    return score
 
 
 class CastleRights():
@@ -305,33 +1101,96 @@ class CastleRights():
 
 
 class Move():
+    """A move packed into a single int; see the MOVE_* layout at the top of the module"""
+    __slots__ = ('code',)
     ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
     rowsToRanks = {v: k for k, v in ranksToRows.items()}
     filesToCols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
     colsToFiles = {v: k for k, v in filesToCols.items()}
 
     def __init__(self, startSq, endSq, board, isEnpassantMove=False, isCastleMove=False):
-        self.startRow = startSq[0]
-        self.startCol = startSq[1]
-        self.endRow = endSq[0]
-        self.endCol = endSq[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
-        self.pieceCaptured = board[self.endRow][self.endCol]
-        self.isPawnPromotion = (self.pieceMoved == 'wp' and self.endRow == 0) or (self.pieceMoved == 'bp' and self.endRow == 7)
-        self.isEnpassantMove = isEnpassantMove
-        if self.isEnpassantMove:
-            self.pieceCaptured = 'wp' if self.pieceMoved == 'bp' else 'bp'
-        self.isCastleMove = isCastleMove
-        self.promotionChoice = 'Q'
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+        pieceMoved = board[startSq[0]][startSq[1]]
+        code = startSq[0] * 8 + startSq[1] | (endSq[0] * 8 + endSq[1]) << 6 | MOVED_BITS[pieceMoved]
+        if isEnpassantMove:
+            code |= MOVE_ENPASSANT | CAPTURED_BITS['wp' if pieceMoved == 'bp' else 'bp']
+        else:
+            code |= CAPTURED_BITS[board[endSq[0]][endSq[1]]]
+        if isCastleMove:
+            code |= MOVE_CASTLE
+        if (pieceMoved == 'wp' and endSq[0] == 0) or (pieceMoved == 'bp' and endSq[0] == 7):
+            code |= MOVE_PROMOTION
+        self.code = code
+
+    @classmethod
+    def fromCode(cls, code):
+        """Shared Move for a packed code; moves never change, so one object serves every position"""
+        move = _movePool.get(code)
+        if move is None:
+            move = _movePool[code] = object.__new__(cls)
+            move.code = code
+        return move
+
+    def withPromotion(self, piece):
+        """The same move promoting to piece ('Q', 'R', 'B' or 'N')"""
+        return Move.fromCode(self.code & ~(3 << PROMOTION_SHIFT) | PROMOTION_PIECES.index(piece) << PROMOTION_SHIFT)
+
+    @property
+    def startRow(self):
+        return (self.code & 63) >> 3
+
+    @property
+    def startCol(self):
+        return self.code & 7
+
+    @property
+    def endRow(self):
+        return (self.code >> 9) & 7
+
+    @property
+    def endCol(self):
+        return (self.code >> 6) & 7
+
+    @property
+    def pieceMoved(self):
+        return PIECE_NAMES[self.code >> MOVED_SHIFT]
+
+    @property
+    def pieceCaptured(self):
+        return PIECE_NAMES[(self.code >> CAPTURED_SHIFT) & 15]
+
+    @property
+    def isPawnPromotion(self):
+        return bool(self.code & MOVE_PROMOTION)
+
+    @property
+    def isEnpassantMove(self):
+        return bool(self.code & MOVE_ENPASSANT)
+
+    @property
+    def isCastleMove(self):
+        return bool(self.code & MOVE_CASTLE)
+
+    @property
+    def promotionChoice(self):
+        return PROMOTION_PIECES[(self.code >> PROMOTION_SHIFT) & 3]
+
+    @property
+    def moveID(self):
+        return self.code & MOVE_SQUARES
 
     def __eq__(self, other):
         if isinstance(other, Move):
-            return self.moveID == other.moveID
+            return (self.code ^ other.code) & MOVE_SQUARES == 0
         return False
 
+    def __hash__(self):
+        return self.code & MOVE_SQUARES
+
     def getChessNotation(self):
         return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
 
     def getRankFile(self, r, c):
-        return self.colsToFiles[c] + self.rowsToRanks[r]
\ No newline at end of file
+        return self.colsToFiles[c] + self.rowsToRanks[r]
+
+
+_movePool = {}
@@ -0,0 +1,194 @@
+# Evaluation tables shared by the engine, which keeps their per-square sums up to date in makeMove/undoMove,
+# and the AI, which reads those sums at every leaf.
+
+pieceScore = {"K": 0, "Q": 9, "R": 5, "B": 3.3, "N": 3.2, "p": 1}
+
+pst = {
+    'p': [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [5, 5, 5, 5, 5, 5, 5, 5],
+        [1, 1, 2, 3, 3, 2, 1, 1],
+        [0.5, 0.5, 1, 2.5, 2.5, 1, 0.5, 0.5],
+        [0, 0, 0, 2, 2, 0, 0, 0],
+        [0.5, -0.5, -1, 0, 0, -1, -0.5, 0.5],
+        [0.5, 1, 1, -2, -2, 1, 1, 0.5],
+        [0, 0, 0, 0, 0, 0, 0, 0]
+    ],
+    'N': [
+        [-5, -4, -3, -3, -3, -3, -4, -5],
+        [-4, -2, 0, 0.5, 0.5, 0, -2, -4],
+        [-3, 0.5, 1, 1.5, 1.5, 1, 0.5, -3],
+        [-3, 0, 1.5, 2, 2, 1.5, 0, -3],
+        [-3, 0.5, 1.5, 2, 2, 1.5, 0.5, -3],
+        [-3, 0, 1, 1.5, 1.5, 1, 0, -3],
+        [-4, -2, 0, 0, 0, 0, -2, -4],
+        [-5, -4, -3, -3, -3, -3, -4, -5]
+    ],
+    'B': [
+        [-2, -1, -1, -1, -1, -1, -1, -2],
+        [-1, 0, 0, 0, 0, 0, 0, -1],
+        [-1, 0, 0.5, 1, 1, 0.5, 0, -1],
+        [-1, 0.5, 0.5, 1, 1, 0.5, 0.5, -1],
+        [-1, 0, 1, 1, 1, 1, 0, -1],
+        [-1, 1, 1, 1, 1, 1, 1, -1],
+        [-1, 0.5, 0, 0, 0, 0, 0.5, -1],
+        [-2, -1, -1, -1, -1, -1, -1, -2]
+    ],
+    'R': [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0.5, 1, 1, 1, 1, 1, 1, 0.5],
+        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+        [0, 0, 0, 0.5, 0.5, 0, 0, 0]
+    ],
+    'Q': [
+        [-2, -1, -1, -0.5, -0.5, -1, -1, -2],
+        [-1, 0, 0, 0, 0, 0, 0, -1],
+        [-1, 0, 0.5, 0.5, 0.5, 0.5, 0, -1],
+        [-0.5, 0, 0.5, 0.5, 0.5, 0.5, 0, -0.5],
+        [0, 0, 0.5, 0.5, 0.5, 0.5, 0, -0.5],
+        [-1, 0.5, 0.5, 0.5, 0.5, 0.5, 0, -1],
+        [-1, 0, 0.5, 0, 0, 0, 0, -1],
+        [-2, -1, -1, -0.5, -0.5, -1, -1, -2]
+    ],
+    'K': [
+        [-3, -4, -4, -5, -5, -4, -4, -3],
+        [-3, -4, -4, -5, -5, -4, -4, -3],
+        [-3, -4, -4, -5, -5, -4, -4, -3],
+        [-3, -4, -4, -5, -5, -4, -4, -3],
+        [-2, -3, -3, -4, -4, -3, -3, -2],
+        [-1, -2, -2, -2, -2, -2, -2, -1],
+        [2, 2, 0, 0, 0, 0, 2, 2],
+        [2, 3, 1, 0, 0, 1, 3, 2]
+    ]
+}
+
+
+pst_endgame_king = [
+    [-5, -4, -3, -2, -2, -3, -4, -5],
+    [-3, -2, -1, 0, 0, -1, -2, -3],
+    [-3, -1, 2, 3, 3, 2, -1, -3],
+    [-3, -1, 3, 4, 4, 3, -1, -3],
+    [-3, -1, 3, 4, 4, 3, -1, -3],
+    [-3, -1, 2, 3, 3, 2, -1, -3],
+    [-3, -3, 0, 0, 0, 0, -3, -3],
+    [-5, -3, -3, -3, -3, -3, -3, -5]
+]
+
+# Weights of the per-square terms inside evaluateBoard
+PST_WEIGHT = 0.1
+CENTER_WEIGHT = 0.3
+ACTIVITY_WEIGHT = 0.1
+CENTER_SQUARES = ((3, 3), (3, 4), (4, 3), (4, 4))
+EXTENDED_CENTER = ((2, 2), (2, 3), (2, 4), (2, 5), (3, 2), (3, 5),
+                   (4, 2), (4, 5), (5, 2), (5, 3), (5, 4), (5, 5))
+
+# Game phase counts down from MAX_PHASE (all minor and major pieces on) to 0 (kings and pawns only)
+PHASE_WEIGHTS = {'p': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+MAX_PHASE = 24
+
+# Pawn structure terms, in pawns before the pawn structure weight; passed pawn bonus by ranks advanced
+DOUBLED_PAWN_PENALTY = 0.5
+ISOLATED_PAWN_PENALTY = 0.3
+BACKWARD_PAWN_PENALTY = 0.2
+PASSED_PAWN_BONUS = (0, 0.5, 1, 1.5, 2.5, 4, 0)
+
+
+def centerBonus(r, c):
+    """Reward for any piece standing on a central square"""
+    if (r, c) in CENTER_SQUARES:
+        return 0.5
+    if (r, c) in EXTENDED_CENTER:
+        return 0.2
+    return 0
+
+
+def activityBonus(piece, r, c):
+    """Reward for advanced pawns and knights/bishops that have left the back rank"""
+    bonus = 0
+    if piece[1] == 'p':
+        if piece[0] == 'w' and r < 4:
+            bonus = (6 - r) * 0.1
+        elif piece[0] == 'b' and r > 3:
+            bonus = (r - 1) * 0.1
+    elif piece[1] in ('N', 'B') and r != (7 if piece[0] == 'w' else 0):
+        bonus = 0.3
+    return bonus
+
+
+def _buildPieceSquareTables(endgame):
+    """Per piece, a 64-entry list of everything evaluateBoard scores from a piece standing on a square: material,
+    position table, center control and activity. Values are integer centipawns from White's point of view, so the
+    running sums kept by GameState stay exact through any number of makeMove/undoMove pairs."""
+    tables = {}
+    for piece in ('wp', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bp', 'bN', 'bB', 'bR', 'bQ', 'bK'):
+        kind = piece[1]
+        sign = 1 if piece[0] == 'w' else -1
+        table = []
+        for sq in range(64):
+            r, c = sq >> 3, sq & 7
+            pr = r if piece[0] == 'w' else 7 - r
+            positional = pst_endgame_king[pr][c] if kind == 'K' and endgame else pst[kind][pr][c]
+            value = (pieceScore[kind] + positional * PST_WEIGHT + centerBonus(r, c) * CENTER_WEIGHT
+                     + activityBonus(piece, r, c) * ACTIVITY_WEIGHT)
+            table.append(sign * round(value * 100))
+        tables[piece] = table
+    return tables
+
+
+def packScore(mg, eg, phase):
+    """Middlegame score, endgame score and phase in one int, so a single addition updates all three"""
+    return mg + (eg << SCORE_LANE_BITS) + (phase << 2 * SCORE_LANE_BITS)
+
+
+def unpackScore(packed):
+    """(mg, eg, phase) from a sum of packScore values"""
+    mg = ((packed + SCORE_LANE_HALF) & SCORE_LANE_MASK) - SCORE_LANE_HALF
+    packed = (packed - mg) >> SCORE_LANE_BITS
+    eg = ((packed + SCORE_LANE_HALF) & SCORE_LANE_MASK) - SCORE_LANE_HALF
+    return mg, eg, (packed - eg) >> SCORE_LANE_BITS
+
+
+SCORE_LANE_BITS = 32
+SCORE_LANE_MASK = (1 << SCORE_LANE_BITS) - 1
+SCORE_LANE_HALF = 1 << (SCORE_LANE_BITS - 1)
+PIECE_SQUARE_MG = _buildPieceSquareTables(False)
+PIECE_SQUARE_EG = _buildPieceSquareTables(True)
+PIECE_SQUARE_SCORES = {piece: [packScore(mg, eg, PHASE_WEIGHTS[piece[1]])
+                               for mg, eg in zip(PIECE_SQUARE_MG[piece], PIECE_SQUARE_EG[piece])]
+                       for piece in PIECE_SQUARE_MG}
+
+
+def _squareBits(squares):
+    bits = 0
+    for r, c in squares:
+        if 0 <= r < 8 and 0 <= c < 8:
+            bits |= 1 << (r * 8 + c)
+    return bits
+
+
+def _buildPawnMasks():
+    """Per side and square: the files-ahead span an enemy pawn must be absent from for a passed pawn, the
+    adjacent-file squares level with or behind it where a friendly pawn could support it, and the squares an enemy
+    pawn would attack its stop square from"""
+    passed = {'w': [], 'b': []}
+    support = {'w': [], 'b': []}
+    stopAttackers = {'w': [], 'b': []}
+    for sq in range(64):
+        r, c = sq >> 3, sq & 7
+        files = (c - 1, c, c + 1)
+        passed['w'].append(_squareBits((row, f) for row in range(r) for f in files))
+        passed['b'].append(_squareBits((row, f) for row in range(r + 1, 8) for f in files))
+        support['w'].append(_squareBits((row, f) for row in range(r, 8) for f in (c - 1, c + 1)))
+        support['b'].append(_squareBits((row, f) for row in range(r + 1) for f in (c - 1, c + 1)))
+        stopAttackers['w'].append(_squareBits(((r - 2, c - 1), (r - 2, c + 1))))
+        stopAttackers['b'].append(_squareBits(((r + 2, c - 1), (r + 2, c + 1))))
+    return passed, support, stopAttackers
+
+
+FILE_MASKS = [_squareBits((r, c) for r in range(8)) for c in range(8)]
+ADJACENT_FILE_MASKS = [(FILE_MASKS[c - 1] if c > 0 else 0) | (FILE_MASKS[c + 1] if c < 7 else 0) for c in range(8)]
+PASSED_PAWN_MASKS, PAWN_SUPPORT_MASKS, STOP_ATTACK_MASKS = _buildPawnMasks()
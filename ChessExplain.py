@@ -185,7 +185,8 @@ CONTENT = {
                     "How it works:",
                     "1. Generate all possible moves",
                     "2. For each move, simulate opponent's responses",
-                    "3. Evaluate positions at search depth",
+                    "3. At search depth, play out captures until",
+                    "   the position is quiet, then evaluate",
                     "4. Choose move leading to best evaluation",
                     "",
                     "Alpha-Beta Pruning:",
@@ -193,11 +194,16 @@ CONTENT = {
                     "affect the final decision, reducing computation",
                     "by up to 75%!",
                     "",
-                    "Depth Levels:",
-                    "• Easy (1): Looks 1 move ahead",
-                    "• Medium (2): Looks 2 moves ahead (1 full turn)",
-                    "• Hard (3): Looks 3 moves ahead",
-                    "• Expert (4): Looks 4 moves ahead (2 full turns)"
+                    "Iterative Deepening:",
+                    "Searches 1 move ahead, then 2, then 3... until",
+                    "its think time runs out, trying the previous best",
+                    "move first. Plays the deepest finished result.",
+                    "",
+                    "Think Time Levels:",
+                    "• Easy (1): 0.15 seconds per move",
+                    "• Medium (2): 0.5 seconds per move",
+                    "• Hard (3): 1.5 seconds per move",
+                    "• Expert (4): 4 seconds per move"
                 ]
             },
             {
@@ -217,37 +223,45 @@ CONTENT = {
                     "  Penalties for exposed king",
                     "",
                     "Mobility (5% weight):",
-                    "  Number of legal moves available",
-                    "  More moves = more options",
+                    "  Squares each side's pieces can reach",
+                    "  More squares = more options",
                     "",
                     "Center Control (30% weight):",
                     "  Occupying central squares (d4,e4,d5,e5)",
                     "",
                     "Pawn Structure (20% weight):",
-                    "  Penalties: doubled, isolated pawns",
-                    "  Bonuses: passed pawns",
+                    "  Penalties: doubled, isolated, backward pawns",
+                    "  Bonuses: passed pawns (more when advanced)",
+                    "  Cached by pawn position",
                     "",
                     "Piece Activity (10% weight):",
-                    "  Developed pieces, advanced pawns"
+                    "  Developed pieces, advanced pawns",
+                    "",
+                    "Material, position, center and activity scores",
+                    "are running totals updated on every move,",
+                    "blended between middlegame and endgame tables",
+                    "by how many pieces are left."
                 ]
             },
             {
                 "title": "Move Ordering Optimization",
                 "content": [
                     "The AI examines promising moves first to enable",
-                    "better pruning. Move priority:",
+                    "better pruning. Moves are generated in stages,",
+                    "each only if the earlier ones gave no cutoff:",
                     "",
-                    "1. Captures (especially valuable pieces)",
-                    "   Score: 10 × (captured) - (attacker)",
+                    "1. Hash Move",
+                    "   Best move stored in the transposition table",
                     "",
-                    "2. Pawn Promotions",
-                    "   Score: +8",
+                    "2. Captures and Promotions",
+                    "   Most valuable victim, cheapest attacker first",
+                    "   Losing captures (SEE) wait until last",
                     "",
-                    "3. Castling",
-                    "   Score: +2",
+                    "3. Killer Moves",
+                    "   Quiet moves that caused cutoffs elsewhere",
                     "",
-                    "4. Center Control",
-                    "   Score: +0.5",
+                    "4. Quiet Moves",
+                    "   Everything else",
                     "",
                     "This ordering can reduce search time by 3-5x!"
                 ]
@@ -260,15 +274,21 @@ CONTENT = {
                     "",
                     "How it works:",
                     "• Each board position gets a unique hash",
-                    "• Hash = board state + whose turn",
-                    "• Stores: position score + search depth",
-                    "• Retrieves score if depth >= current depth",
+                    "• Hash = 64-bit Zobrist key (pieces, turn,",
+                    "  castling rights, en passant file)",
+                    "• Stores: score, bound (exact/lower/upper),",
+                    "  depth and best move",
+                    "• Reuses a score if it was searched deep enough",
+                    "  and its bound fits the alpha-beta window",
+                    "• Tries the stored best move first",
                     "",
                     "Benefits:",
                     "• Speeds up searches by ~40%",
                     "• Handles transpositions (same position",
                     "  reached via different move orders)",
-                    "• Memory efficient (clears each search)"
+                    "• Fixed size (524,288 entries, about",
+                    "  12 MB), kept between moves",
+                    "• Deeper results replace shallower ones"
                 ]
             }
         ]
@@ -360,7 +380,7 @@ CONTENT = {
                     "",
                     "AI Difficulty: 4 levels",
                     "  Easy (1), Medium (2), Hard (3), Expert (4)",
-                    "  Higher = deeper search, stronger play",
+                    "  Higher = longer think time, deeper search",
                     "",
                     "Timer Options: 4 time controls",
                     "  3min, 5min, 10min, 15min",
@@ -447,9 +467,9 @@ CONTENT = {
                 "content": [
                     "Key Functions:",
                     "",
-                    "findBestMove(gs, validMoves)",
+                    "findBestMove(gs, validMoves, timeLimitMs, nodeLimit)",
                     "  Entry point, returns best move",
-                    "  Clears transposition table",
+                    "  Deepens until the time or node budget runs out",
                     "",
                     "alphaBeta(gs, depth, alpha, beta, turn)",
                     "  Recursive minimax with pruning",
@@ -466,21 +486,15 @@ CONTENT = {
                     "  Evaluates king protection",
                     "",
                     "mobility(gs)",
-                    "  Counts available moves",
-                    "",
-                    "centerControl(gs)",
-                    "  Scores center square occupation",
+                    "  Compares reachable squares for both sides",
                     "",
                     "pawnStructure(gs)",
                     "  Analyzes pawn formation quality",
                     "",
-                    "pieceActivity(gs)",
-                    "  Rewards developed pieces",
-                    "",
                     "Data:",
-                    "  • pieceScore{} - Material values",
-                    "  • pst{} - Position-square tables",
-                    "  • transpositionTable{} - Memoization"
+                    "  • ChessEval.py - Material values and",
+                    "    position-square tables",
+                    "  • transpositionTable - Fixed-size search cache"
                 ]
             },
             {
@@ -510,7 +524,11 @@ CONTENT = {
                     "   Returns immediately on checkmate",
                     "   Doesn't search further",
                     "",
-                    "Result: Expert AI responds in < 3 seconds!"
+                    "7. Quiescence Search",
+                    "   Follows only captures and promotions",
+                    "   past the search depth",
+                    "",
+                    "Result: Expert AI moves in about 4 seconds!"
                 ]
             }
         ]
@@ -38,6 +38,14 @@ DARK_MODE = {
 }
 
 PIECE_SETS = ["images", "images_bold", "images_site"]
+# AI think time per move in milliseconds for each difficulty level
+AI_THINK_TIME_MS = {1: 150, 2: 500, 3: 1500, 4: 4000}
+# Keep searching on the human's time after the AI moves
+AI_PONDER = True
+# JSONL file to log the statistics of every AI search to, or None
+AI_SEARCH_LOG = None
+# Opening book the AI plays from when the file exists (build one with ChessBook.py)
+AI_OPENING_BOOK = "book.bin"
 
 def load_images(piece_set="images_site"):
     global IMAGES
@@ -572,7 +580,7 @@ def drawButtons(screen, font, undoEnabled=True):
         
         return homeRect, None, resetRect
 
-def drawTurnIndicator(screen, gs, font):
+def drawTurnIndicator(screen, gs, font, thinking=False):
     turnRect = p.Rect(WIDTH + 10, 10, PANEL_WIDTH - 20, 40)
     
     if gs.whiteToMove:
@@ -590,12 +598,29 @@ def drawTurnIndicator(screen, gs, font):
     
     icon = "♔" if gs.whiteToMove else "♚"
     turn_text = f"{icon} White's Turn" if gs.whiteToMove else f"{icon} Black's Turn"
+    if thinking:
+        dots = "." * (p.time.get_ticks() // 400 % 4)
+        turn_text = f"{icon} {'White' if gs.whiteToMove else 'Black'} is thinking{dots:<3}"
     
     textFont = p.font.SysFont("Arial", 20, True)
     textColor = p.Color('black') if gs.whiteToMove else p.Color('white')
     textObj = textFont.render(turn_text, True, textColor)
     screen.blit(textObj, (turnRect.centerx - textObj.get_width()//2, turnRect.centery - textObj.get_height()//2))
 
+def aiThinkTime(aiDifficulty, timerEnabled, clockLeft):
+    """Milliseconds the AI may spend on its next move"""
+    thinkTime = AI_THINK_TIME_MS[aiDifficulty]
+    if timerEnabled:
+        # Never spend more than a small slice of the remaining clock on one move
+        thinkTime = min(thinkTime, max(50, int(clockLeft * 1000 / 30)))
+    return thinkTime
+
+def cancelAISearch(aiSearch):
+    """Stop a running AI search; returns None to clear the caller's handle"""
+    if aiSearch is not None:
+        aiSearch.cancel()
+    return None
+
 def drawTimer(screen, whiteTime, blackTime, isWhiteTurn, font):
     def formatTime(seconds):
         mins = int(seconds // 60)
@@ -729,6 +754,7 @@ def drawText(screen, text):
 
 def main():
     p.init()
+    ChessAI.SEARCH_LOG_PATH = AI_SEARCH_LOG
     try:
         p.mixer.init()
         sounds = {
@@ -743,6 +769,10 @@ def main():
         }
     except:
         sounds = None
+    try:
+        ChessAI.loadOpeningBook(AI_OPENING_BOOK)
+    except OSError:
+        pass
 
     screen = p.display.set_mode((WIDTH + PANEL_WIDTH, HEIGHT))
     p.display.set_caption("Chess Game - Enhanced Edition")
@@ -774,6 +804,7 @@ def main():
     gameModeState = None
     promotionPiece = None
     showingPromotion = False
+    aiSearch = None
     
     load_images(currentPieceSet)
     font = p.font.SysFont("Arial", 16, False, False)
@@ -834,6 +865,7 @@ def main():
                             playerTwo = True
                         
                         gs = ChessEngine.GameState()
+                        ChessAI.transpositionTable.clear()
                         validMoves = gs.getValidMoves()
                         gameState = "game"
                         gameOver = False
@@ -858,6 +890,7 @@ def main():
                             playerTwo = True
                         
                         gs = ChessEngine.GameState()
+                        ChessAI.transpositionTable.clear()
                         validMoves = gs.getValidMoves()
                         gameState = "game"
                         gameOver = False
@@ -1061,8 +1094,9 @@ def main():
                             showingPromotion = False
                             if len(gs.moveLog) > 0:
                                 lastMove = gs.moveLog[-1]
-                                lastMove.promotionChoice = promotionPiece
-                                gs.board[lastMove.endRow][lastMove.endCol] = lastMove.pieceMoved[0] + promotionPiece
+                                gs.undoMove()
+                                gs.makeMove(lastMove.withPromotion(promotionPiece))
+                                moveMade = True
                             if sounds and promotionPiece:
                                 sounds["promote"].play()
                         continue
@@ -1078,6 +1112,7 @@ def main():
                             homeRect, undoRect, resetRect = buttonRects
                         
                         if homeRect.collidepoint(location):
+                            aiSearch = cancelAISearch(aiSearch)
                             gameState = "menu"
                             gs = None
                             validMoves = []
@@ -1090,6 +1125,7 @@ def main():
                             continue
                         
                         elif undoRect and undoRect.collidepoint(location) and undoEnabled:
+                            aiSearch = cancelAISearch(aiSearch)
                             if len(gs.moveLog) > 0:
                                 if not playerTwo:
                                     if len(gs.moveLog) >= 2:
@@ -1109,7 +1145,9 @@ def main():
                                     timerStarted = False
                         
                         elif resetRect.collidepoint(location):
+                            aiSearch = cancelAISearch(aiSearch)
                             gs = ChessEngine.GameState()
+                            ChessAI.transpositionTable.clear()
                             validMoves = gs.getValidMoves()
                             sqSelected = ()
                             playerClicks = []
@@ -1163,6 +1201,7 @@ def main():
                     if e.key == p.K_ESCAPE:
                         running = False
                     elif e.key == p.K_z and undoEnabled:
+                        aiSearch = cancelAISearch(aiSearch)
                         if len(gs.moveLog) > 0:
                             if not playerTwo:
                                 if len(gs.moveLog) >= 2:
@@ -1182,7 +1221,9 @@ def main():
                                 timerStarted = False
                     
                     elif e.key == p.K_r:
+                        aiSearch = cancelAISearch(aiSearch)
                         gs = ChessEngine.GameState()
+                        ChessAI.transpositionTable.clear()
                         validMoves = gs.getValidMoves()
                         sqSelected = ()
                         playerClicks = []
@@ -1194,25 +1235,43 @@ def main():
                         lastTime = time.time()
                         timerStarted = False
             
+            if gameOver and aiSearch is not None:
+                aiSearch = cancelAISearch(aiSearch)
+            
             if not gameOver and not humanTurn and not showingPromotion:
                 # Start timer on AI's first move
                 if not timerStarted and timerEnabled:
                     timerStarted = True
                     lastTime = time.time()
                 
-                ChessAI.DEPTH = aiDifficulty
-                AIMove = ChessAI.findBestMove(gs, validMoves)
-                if AIMove is None:
-                    AIMove = ChessAI.findRandomMove(validMoves)
-                
-                if AIMove and AIMove.isPawnPromotion:
-                    AIMove.promotionChoice = 'Q'
-                
-                if AIMove:
-                    gs.makeMove(AIMove)
-                    moveMade = True
-                    animate = True
-                    playMoveSound(AIMove, gs, sounds)
+                # The search runs on a background thread; the loop keeps drawing and polls it each frame
+                thinkTime = aiThinkTime(aiDifficulty, timerEnabled, whiteTime if gs.whiteToMove else blackTime)
+                if aiSearch is not None and aiSearch.pondering:
+                    # The human has moved: a correct prediction keeps the ponder search, now timed; a wrong one
+                    # is dropped, but what it stored in the transposition table still speeds up the new search
+                    if aiSearch.isPonderHit(gs):
+                        aiSearch.ponderHit(thinkTime)
+                    else:
+                        aiSearch = cancelAISearch(aiSearch)
+                if aiSearch is None:
+                    aiSearch = ChessAI.SearchTask(gs, timeLimitMs=thinkTime)
+                elif aiSearch.done():
+                    bestMove = aiSearch.result()
+                    aiSearch = None
+                    AIMove = next((move for move in validMoves if move == bestMove), None)
+                    if AIMove is None:
+                        AIMove = ChessAI.findRandomMove(validMoves)
+                    
+                    if AIMove and AIMove.isPawnPromotion:
+                        AIMove = AIMove.withPromotion('Q')
+                    
+                    if AIMove:
+                        gs.makeMove(AIMove)
+                        moveMade = True
+                        animate = True
+                        playMoveSound(AIMove, gs, sounds)
+                        if AI_PONDER and not playerTwo:
+                            aiSearch = ChessAI.SearchTask(gs, ponder=True)
             
             if moveMade and gs is not None:
                 if animate and not showingPromotion:
@@ -1229,7 +1288,7 @@ def main():
                 if timerEnabled:
                     drawTimer(screen, whiteTime, blackTime, gs.whiteToMove, font)
                 
-                drawTurnIndicator(screen, gs, font)
+                drawTurnIndicator(screen, gs, font, aiSearch is not None and not aiSearch.pondering)
                 
                 if showingPromotion:
                     drawPromotionMenu(screen, gs.whiteToMove)
@@ -1257,5 +1316,7 @@ def main():
             clock.tick(MAX_FPS)
             p.display.flip()
 
+    cancelAISearch(aiSearch)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
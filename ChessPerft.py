@@ -0,0 +1,106 @@
+import argparse
+import sys
+import time
+
+import ChessEngine
+
+# name: (FEN, expected leaf counts for depth 1, 2, ..., depth run by default)
+# Pawns only ever promote to a queen here (the piece is picked after the move), so positions with
+# promotions inside the horizon count fewer nodes than the usual published perft tables.
+POSITIONS = {
+    "start": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+              [20, 400, 8902, 197281, 4865609], 4),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 [48, 2039, 97862, 4074224], 3),
+    "endgame": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                [14, 191, 2812, 43238, 674624], 4),
+    "castling": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                 [6, 228, 8087, 320802], 3),
+    "promotion": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                  [41, 1373, 54007, 1806790], 3),
+    "middlegame": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                   [46, 2079, 89890, 3894594], 3),
+    "enpassant-pin": ("8/8/8/KPp4r/8/8/8/7k w - c6 0 1",
+                      [4, 56, 259, 4225, 22991], 5),
+    "enpassant-check": ("8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1",
+                        [9, 50, 379, 2369, 17840], 5),
+    # No black pawn stands on e4, so the e3 target is dropped and d2 has no en passant capture
+    "enpassant-phantom": ("4k3/8/8/8/8/8/3P4/4K3 w - e3 0 1",
+                          [6, 30, 220, 1492, 11602], 5),
+}
+
+
+def perft(gs, depth):
+    """Number of leaf nodes depth plies below the current position"""
+    moves = gs.getValidMoves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+
+def divide(gs, depth):
+    """Leaf counts below each root move, as (move notation, nodes) pairs"""
+    results = []
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        results.append((move.getChessNotation(), perft(gs, depth - 1)))
+        gs.undoMove()
+    return sorted(results)
+
+
+def runPosition(name, fen, depth, expected=None, showDivide=False):
+    gs = ChessEngine.GameState.fromFEN(fen)
+    start = time.perf_counter()
+    if showDivide:
+        results = divide(gs, depth)
+        nodes = sum(count for _, count in results)
+    else:
+        nodes = perft(gs, depth)
+    elapsed = time.perf_counter() - start
+    if showDivide:
+        for notation, count in results:
+            print(f"  {notation}: {count}")
+    status = ""
+    if expected is not None:
+        status = "ok" if nodes == expected else f"FAIL (expected {expected})"
+    nps = nodes / elapsed if elapsed > 0 else 0
+    print(f"{name:16} depth {depth}  nodes {nodes:>10}  {elapsed:7.2f}s  {nps:>10,.0f} nps  {status}")
+    return nodes, expected is None or nodes == expected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count move generator leaf nodes and check them against known totals.")
+    parser.add_argument("--position", choices=sorted(POSITIONS), action="append",
+                        help="built-in position to run (repeatable, default: all)")
+    parser.add_argument("--fen", help="run a custom position instead of the built-in ones")
+    parser.add_argument("--depth", type=int, help="search depth (default: each position's regression depth)")
+    parser.add_argument("--divide", action="store_true", help="print the node count below each root move")
+    args = parser.parse_args(argv)
+
+    if args.fen:
+        runPosition("fen", args.fen, args.depth or 3, showDivide=args.divide)
+        return 0
+
+    allPassed = True
+    totalNodes = 0
+    start = time.perf_counter()
+    for name in args.position or POSITIONS:
+        fen, counts, defaultDepth = POSITIONS[name]
+        depth = args.depth or defaultDepth
+        expected = counts[depth - 1] if depth <= len(counts) else None
+        nodes, passed = runPosition(name, fen, depth, expected, args.divide)
+        totalNodes += nodes
+        allPassed &= passed
+    elapsed = time.perf_counter() - start
+    print(f"total {totalNodes} nodes in {elapsed:.2f}s ({totalNodes / elapsed:,.0f} nps), "
+          f"{'all counts match' if allPassed else 'COUNT MISMATCH'}")
+    return 0 if allPassed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import argparse
+import sys
+import time
+
+import ChessAI
+import ChessEngine
+from ChessPerft import POSITIONS
+
+BENCH_POSITIONS = ("start", "kiwipete", "middlegame", "endgame")
+WORKER_COUNTS = (1, 2, 4, 8)
+# name: (FEN, mating moves); the search must find one of them with a mate score at the default depth
+MATE_POSITIONS = {
+    "back-rank": ("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1", ("a1a8",)),
+    "scholars-mate": ("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4", ("h5f7",)),
+    # Mate in 2 whose score reaches the aspiration window's mate bound
+    "rook-mate-in-2": ("k7/8/2K5/8/8/8/8/7R w - - 0 1", ("c6c7", "c6b6")),
+}
+MATE_TIME_LIMIT_MS = 5000
+# name: (FEN, depth); searching with and without transposition table cutoffs must give the same move and score
+TT_POSITIONS = {
+    # Quiescence pruning once stored upper bounds below what the pruned captures reach
+    "delta-pruning": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", 2),
+}
+
+
+def timeToDepth(fen, depth, workers, lazySMP):
+    """Seconds, SearchStats and best move for findBestMove to complete depth from a cold transposition table"""
+    gs = ChessEngine.GameState.fromFEN(fen)
+    ChessAI.DEPTH = depth
+    ChessAI.transpositionTable.clear()
+    if workers > 1:
+        # Start the pool before the clock so process start-up is not counted
+        ChessAI.getWorkerPool(workers)
+        ChessAI.sharedTable.clear()
+    start = time.perf_counter()
+    move = ChessAI.findBestMove(gs, gs.getValidMoves(), workers=workers, lazySMP=lazySMP)
+    return time.perf_counter() - start, ChessAI.lastSearchStats, move
+
+
+def checkMates():
+    """Search every MATE_POSITIONS entry; True if each one plays a mating move with a mate score"""
+    allPassed = True
+    for name, (fen, mates) in MATE_POSITIONS.items():
+        gs = ChessEngine.GameState.fromFEN(fen)
+        ChessAI.transpositionTable.clear()
+        start = time.perf_counter()
+        # The time limit only stops a broken search from hanging; a working one returns on the mate score
+        move = ChessAI.findBestMove(gs, gs.getValidMoves(), timeLimitMs=MATE_TIME_LIMIT_MS)
+        elapsed = time.perf_counter() - start
+        stats = ChessAI.lastSearchStats
+        passed = move is not None and move.getChessNotation() in mates and abs(stats.score) >= ChessAI.CHECKMATE
+        allPassed &= passed
+        print(f"{name:16} {move.getChessNotation() if move else '-':6} score {stats.score:9.2f}  depth {stats.depth:2}  "
+              f"{elapsed:6.2f}s  {'ok' if passed else 'FAIL (expected ' + ' or '.join(mates) + ')'}")
+    return allPassed
+
+
+class UnprobedTable(ChessAI.TranspositionTable):
+    """Transposition table that keeps hash moves for ordering but never answers a probe"""
+
+    def probe(self, key):
+        return None
+
+
+def checkTranspositions():
+    """Search every TT_POSITIONS entry with and without table cutoffs; True if each pair agrees"""
+    allPassed = True
+    table = ChessAI.transpositionTable
+    for name, (fen, depth) in TT_POSITIONS.items():
+        ChessAI.DEPTH = depth
+        results = []
+        for searchTable in (table, UnprobedTable()):
+            searchTable.clear()
+            ChessAI.transpositionTable = searchTable
+            try:
+                gs = ChessEngine.GameState.fromFEN(fen)
+                move = ChessAI.findBestMove(gs, gs.getValidMoves())
+            finally:
+                ChessAI.transpositionTable = table
+            results.append((move.getChessNotation() if move else '-', ChessAI.lastSearchStats.score))
+        (move, score), (plainMove, plainScore) = results
+        passed = move == plainMove and abs(score - plainScore) < 1e-9
+        allPassed &= passed
+        print(f"{name:16} depth {depth:2}  with table {move} {score:7.2f}  without {plainMove} {plainScore:7.2f}  "
+              f"{'ok' if passed else 'FAIL'}")
+    return allPassed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare search time-to-depth across worker counts.")
+    parser.add_argument("--position", choices=sorted(POSITIONS), action="append",
+                        help="built-in position to search (repeatable, default: %s)" % ", ".join(BENCH_POSITIONS))
+    parser.add_argument("--depth", type=int, default=5, help="depth every run must complete (default: 5)")
+    parser.add_argument("--workers", type=int, nargs="+", default=list(WORKER_COUNTS),
+                        help="worker counts to compare (default: 1 2 4 8)")
+    parser.add_argument("--root-split", action="store_true", help="split root moves instead of lazy SMP")
+    parser.add_argument("--no-null-move", action="store_true", help="turn off null-move pruning")
+    parser.add_argument("--no-lmr", action="store_true", help="turn off late move reductions")
+    parser.add_argument("--log", metavar="FILE", help="append each search's statistics to FILE as JSON lines")
+    parser.add_argument("--mates", action="store_true", help="check that the search finds the mates in MATE_POSITIONS")
+    parser.add_argument("--tt-check", action="store_true",
+                        help="check that table cutoffs do not change the result in TT_POSITIONS")
+    args = parser.parse_args(argv)
+    ChessAI.SEARCH_LOG_PATH = args.log
+    ChessAI.NULL_MOVE_PRUNING = not args.no_null_move
+    ChessAI.LATE_MOVE_REDUCTIONS = not args.no_lmr
+    if args.mates:
+        return 0 if checkMates() else 1
+    if args.tt_check:
+        return 0 if checkTranspositions() else 1
+
+    names = args.position or BENCH_POSITIONS
+    totals = {workers: 0.0 for workers in args.workers}
+    try:
+        for name in names:
+            fen = POSITIONS[name][0]
+            for workers in args.workers:
+                elapsed, stats, move = timeToDepth(fen, args.depth, workers, not args.root_split)
+                totals[workers] += elapsed
+                nps = stats.nodes / elapsed if elapsed > 0 else 0
+                # Worker processes keep their own table counters, which the main process never sees
+                ttHits = f"{stats.ttHitRate:4.0%}" if stats.ttHitRate is not None else " n/a"
+                print(f"{name:12} workers {workers:2}  depth {args.depth}  {elapsed:7.2f}s  nodes {stats.nodes:>9}  "
+                      f"{nps:>9,.0f} nps  tt hits {ttHits}  ebf {stats.branchingFactor:4.1f}  "
+                      f"best {move.getChessNotation()}")
+    finally:
+        ChessAI.shutdownWorkers()
+
+    baseline = totals[args.workers[0]]
+    for workers in args.workers:
+        speedup = baseline / totals[workers] if totals[workers] > 0 else 0
+        print(f"workers {workers:2}  total {totals[workers]:7.2f}s  speedup {speedup:4.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())